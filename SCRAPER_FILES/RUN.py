@@ -2,8 +2,8 @@ import json
 import os
 import sys
 from datetime import datetime
-import time
-from SERVICES.scraper_service import run_scrapers
+from SERVICES.scraper_service import SCRAPER_CONFIG, ScraperService
+from SERVICES.site_scheduler import SiteScheduler
 
 def parse_scraper_output(output):
     """Parse scraper output for completeness and new ads data"""
@@ -58,7 +58,7 @@ def parse_scraper_output(output):
     return completeness_data, new_ads_data
 
 def main():
-    """Run scrapers periodically and log results"""
+    """Run each site's scraper whenever its interval is up and log each site's results as it completes"""
     # Create logs directory if it doesn't exist
     logs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
     os.makedirs(logs_dir, exist_ok=True)
@@ -74,54 +74,94 @@ def main():
     except (json.JSONDecodeError, FileNotFoundError):
         log_data = []
     
-    while True:
-        try:
-            print(f"\n=== Starting scraper run at {datetime.now().isoformat()} ===")
-            
-            # Reset the upload service stats before running scrapers
-            from SERVICES.upload_service import reset_stats
-            reset_stats()
-            
-            # Run scrapers
-            run_scrapers()
-            
-            # Get stats from upload service
-            from SERVICES.upload_service import get_last_run_stats
-            completeness_data, new_ads_data = get_last_run_stats()
-            
-            if not new_ads_data:
-                print("\nWarning: No new ads data was parsed!")
-            else:
-                # Print the actual stats from the upload service
-                print("\n=== Scraper Completeness Report ===")
-                for site, stats in completeness_data.items():
-                    print(f"{site}: {stats}")
+    # Each site's next run (see SERVICES/site_scheduler.py)
+    scheduler = SiteScheduler(SCRAPER_CONFIG)
+    # Due sites go to the scraper runner thread (or the scraper pool), so this loop never waits on a scraper
+    service = ScraperService()
+    service.start()
+    try:
+        while True:
+            sites = scheduler.due_sites()
+            if sites:
+                print(f"\n=== Starting scraper run of {', '.join(sites)} at {datetime.now().isoformat()} ===")
+                try:
+                    failed = service.dispatch(sites)
+                except Exception as e:
+                    print(f"Error starting scraper run: {e}")
+                    failed = sites
+                # Retry them after a minute
+                for site in failed:
+                    scheduler.reschedule(site, failed=True)
+
+            # Pages of the running sites go on to translation and upload meanwhile
+            service.poll(min(1.0, max(0.1, scheduler.seconds_until_next())))
+
+            for result in service.completed_sites():
+                log_site_run(log_file, log_data, result, scheduler)
+    finally:
+        service.stop()
+
+def log_site_run(log_file, log_data, result, scheduler):
+    """Reschedule a site whose run completed and add its log entry"""
+    from SERVICES.browser_supervisor import reap_orphan_browsers
+    from SERVICES.run_stats import PARENT_STATS, collect_run_stats, merge_run_stats, reset_run_stats, site_run_stats
+    site = result['site']
+    # A failed run is retried after a minute
+    scheduler.reschedule(site, failed=bool(result['error']))
+    try:
+        # Kill browsers left behind by crashed or killed scrapers
+        reap_orphan_browsers()
+
+        completeness_data, new_ads_data = result['completeness'], result['new_ads']
+        if not new_ads_data:
+            print(f"\nWarning: No new ads data was parsed for {site}!")
+        else:
+            # Print the actual stats from the upload service
+            print("\n=== Scraper Completeness Report ===")
+            for site_name, stats in completeness_data.items():
+                print(f"{site_name}: {stats}")
 
-                print("\n=== New Ads Report ===")
-                for site, stats in new_ads_data.items():
-                    print(f"{site}: {stats}")
-            
-            # Add to log with timestamp
-            log_entry = {
-                'timestamp': datetime.now().isoformat(),
-                'completeness': completeness_data,
-                'new_ads': new_ads_data
-            }
-            log_data.append(log_entry)
-            
-            # Save updated log
-            with open(log_file, 'w') as f:
-                json.dump(log_data, f, indent=2)
-            
-            print(f"Logged data at {log_entry['timestamp']}")
-            print("Waiting 2 minutes until next run...")
-            
-            # Wait 30 minutes
-            time.sleep(1200)
-            
-        except Exception as e:
-            print(f"Error in scraper run: {e}")
-            time.sleep(60)  # Wait a minute before retrying if there's an error
+            print("\n=== New Ads Report ===")
+            for site_category, stats in new_ads_data.items():
+                print(f"{site_category}: {stats}")
+
+        # Add to log with timestamp
+        log_entry = {
+            'timestamp': datetime.now().isoformat(),
+            'sites': [site],
+            'error': result['error'],
+            'timeout': result['timeout'],
+            'pages': result['pages'],
+            'completeness': completeness_data,
+            'new_ads': new_ads_data,
+            # What was measured while the site was scraped, with its translation stats and the
+            # Mongo connections since the previous entry
+            **site_run_stats(merge_run_stats(result['worker_stats'], collect_run_stats(PARENT_STATS)), site),
+            # Read back by the next run's page budget
+            'page_budget': result['page_budget'],
+            'schedule': {site: scheduler.get_stats()[site]}
+        }
+        log_data.append(log_entry)
+        reset_run_stats('process', PARENT_STATS)
+        
+        # Save updated log
+        with open(log_file, 'w') as f:
+            json.dump(log_data, f, indent=2)
+        
+        print(f"Logged {site} run at {log_entry['timestamp']}, next run in "
+              f"{log_entry['schedule'][site]['next_run_in_seconds']:.0f}s")
+        
+    except Exception as e:
+        print(f"Error logging {site} scraper run: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    finally:
+        # Shut down the scraper pool, shared browsers and MongoDB client
+        from SERVICES.driver_service import quit_all_drivers
+        from SERVICES.mongo_service import close_client
+        from SERVICES.scraper_service import shutdown_scraper_pool
+        shutdown_scraper_pool()
+        quit_all_drivers()
+        close_client()
\ No newline at end of file
@@ -0,0 +1,242 @@
+from os import getenv
+import threading
+
+# psutil is optional, without it browsers are neither measured nor recycled for memory and no orphans are reaped
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Every site's browser is tracked with its process tree (chromedriver, Chrome and its renderers).
+# A browser is recycled after BROWSER_MAX_PAGES pages or once its tree uses more than BROWSER_MAX_RSS_MB,
+# and processes of those trees that no live driver owns any more are killed at the end of each run.
+# Each setting can be overridden with the environment variable of the same name.
+SUPERVISOR_CONFIG = {
+    'BROWSER_MAX_PAGES': 150,
+    'BROWSER_MAX_RSS_MB': 1500,
+}
+
+# Process names of the browsers and their drivers
+BROWSER_PROCESS_NAMES = ('chrome', 'chromium', 'chromedriver', 'undetected_chromedriver', 'google-chrome')
+
+# Root pids and pages of each site's live browser
+_browsers = {}
+# Every process seen in the browser trees this process started, {pid: create time}, kept after the
+# browser quits so what it leaves behind can be reaped without touching other programs' browsers
+_started = {}
+_lock = threading.Lock()
+
+# Pages, recycles, memory and CPU per site, and orphans killed, for the current run
+_browser_stats = {}
+_reaper_stats = {'orphans_killed': 0}
+
+def _setting(name):
+    default = SUPERVISOR_CONFIG[name]
+    try:
+        return type(default)(getenv(name, default))
+    except ValueError:
+        return default
+
+def _root_pids(driver):
+    """Get the pids a driver's processes hang off: chromedriver, and Chrome when it's started separately"""
+    pids = []
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    if getattr(process, 'pid', None):
+        pids.append(process.pid)
+    # undetected_chromedriver starts Chrome itself
+    if getattr(driver, 'browser_pid', None):
+        pids.append(driver.browser_pid)
+    return pids
+
+def _tree(root_pids):
+    """Get the live processes of a browser's tree"""
+    processes = {}
+    for pid in root_pids:
+        try:
+            root = psutil.Process(pid)
+            for process in [root] + root.children(recursive=True):
+                processes[process.pid] = process
+        except psutil.Error:
+            continue
+    return list(processes.values())
+
+def _remember(processes):
+    """Record processes of a browser tree this process started"""
+    started = {}
+    for process in processes:
+        try:
+            started[process.pid] = process.create_time()
+        except psutil.Error:
+            continue
+    with _lock:
+        _started.update(started)
+
+def _site_stats(site_name):
+    return _browser_stats.setdefault(site_name, {
+        'pages': 0, 'recycled_for_pages': 0, 'recycled_for_memory': 0,
+        'processes': 0, 'last_rss_mb': None, 'peak_rss_mb': None, 'cpu_seconds': None
+    })
+
+def track_browser(site_name, driver):
+    """Start watching a newly started browser"""
+    roots = _root_pids(driver)
+    with _lock:
+        _browsers[site_name] = {'roots': roots, 'pages': 0, 'rss_mb': None}
+    if psutil:
+        _remember(_tree(roots))
+
+def browser_processes(site_name):
+    """Get the processes of a site's browser (empty without psutil)"""
+    with _lock:
+        browser = _browsers.get(site_name)
+        roots = list(browser['roots']) if browser else []
+    if not psutil or not roots:
+        return []
+    processes = _tree(roots)
+    # Renderers come and go, each one seen is recorded
+    _remember(processes)
+    return processes
+
+def release_browser(site_name, processes):
+    """Stop watching a quit browser and kill what's left of its processes"""
+    with _lock:
+        _browsers.pop(site_name, None)
+    if not psutil:
+        return
+    survivors = [process for process in processes if process.is_running()]
+    if survivors:
+        print(f"Killing {len(survivors)} {site_name} browser processes left after quit")
+        _kill(survivors)
+
+def kill_browser(site_name):
+    """Kill a site's browser tree without going through WebDriver, returning the processes killed"""
+    processes = browser_processes(site_name)
+    if processes:
+        _kill(processes)
+    return len(processes)
+
+def kill_child_browsers(pid):
+    """Kill the browsers and drivers started by another process (e.g. a stuck scraper worker), returning how many"""
+    if not psutil:
+        return 0
+    try:
+        children = psutil.Process(pid).children(recursive=True)
+    except psutil.Error:
+        return 0
+    browsers = []
+    for process in children:
+        try:
+            name = process.name().lower()
+        except psutil.Error:
+            continue
+        if any(browser_name in name for browser_name in BROWSER_PROCESS_NAMES):
+            browsers.append(process)
+    if browsers:
+        _kill(browsers)
+    return len(browsers)
+
+def _kill(processes):
+    for process in processes:
+        try:
+            process.kill()
+        except psutil.Error:
+            pass
+    psutil.wait_procs(processes, timeout=3)
+
+def sample_browser(site_name):
+    """Measure the memory and CPU time of a site's browser tree"""
+    processes = browser_processes(site_name)
+    if not processes:
+        return
+    rss = 0
+    cpu_seconds = 0.0
+    for process in processes:
+        try:
+            rss += process.memory_info().rss
+            cpu = process.cpu_times()
+            cpu_seconds += cpu.user + cpu.system
+        except psutil.Error:
+            continue
+    rss_mb = round(rss / 1024 / 1024, 1)
+    with _lock:
+        if site_name in _browsers:
+            _browsers[site_name]['rss_mb'] = rss_mb
+        stats = _site_stats(site_name)
+        stats['processes'] = max(stats['processes'], len(processes))
+        stats['last_rss_mb'] = rss_mb
+        stats['peak_rss_mb'] = max(stats['peak_rss_mb'] or 0, rss_mb)
+        stats['cpu_seconds'] = round(cpu_seconds, 1)
+
+def note_page(site_name):
+    """Count a page loaded in a site's browser and measure the browser"""
+    with _lock:
+        if site_name in _browsers:
+            _browsers[site_name]['pages'] += 1
+        _site_stats(site_name)['pages'] += 1
+    sample_browser(site_name)
+
+def check_recycle(site_name):
+    """Get why a site's browser should be replaced ('pages' or 'memory', counted in the stats), None if it's fine"""
+    with _lock:
+        browser = _browsers.get(site_name)
+        if not browser:
+            return None
+        reason = None
+        if browser['pages'] >= _setting('BROWSER_MAX_PAGES'):
+            reason = 'pages'
+        elif browser['rss_mb'] is not None and browser['rss_mb'] > _setting('BROWSER_MAX_RSS_MB'):
+            reason = 'memory'
+        if reason:
+            _site_stats(site_name)[f'recycled_for_{reason}'] += 1
+            print(f"Recycling {site_name} browser after {browser['pages']} pages "
+                  f"({browser['rss_mb']} MB, over its {reason} limit)")
+        return reason
+
+def reap_orphan_browsers():
+    """Kill processes of the browsers this process started that no live driver owns (called at the end of a run)"""
+    if not psutil:
+        return 0
+    with _lock:
+        roots = [pid for browser in _browsers.values() for pid in browser['roots']]
+        started = dict(_started)
+    owned = {process.pid for process in _tree(roots)}
+
+    orphans = {}
+    gone = []
+    for pid, create_time in started.items():
+        if pid in owned:
+            continue
+        try:
+            process = psutil.Process(pid)
+            # The pid was reused by a process that isn't ours
+            if process.create_time() != create_time:
+                gone.append(pid)
+                continue
+            for orphan in [process] + process.children(recursive=True):
+                if orphan.pid not in owned:
+                    orphans[orphan.pid] = orphan
+        except psutil.Error:
+            gone.append(pid)
+    if orphans:
+        print(f"Killing {len(orphans)} orphaned browser processes")
+        _kill(list(orphans.values()))
+    with _lock:
+        for pid in gone + list(orphans):
+            _started.pop(pid, None)
+        _reaper_stats['orphans_killed'] += len(orphans)
+    return len(orphans)
+
+def reset_browser_stats():
+    """Reset the browser stats for a new scraper run"""
+    with _lock:
+        _browser_stats.clear()
+        _reaper_stats['orphans_killed'] = 0
+
+def get_browser_stats():
+    """Get pages, recycles and memory per site's browser, and the orphaned processes killed, for the current run"""
+    with _lock:
+        return {
+            'psutil': psutil is not None,
+            'sites': {site: dict(stats) for site, stats in _browser_stats.items()},
+            'orphans_killed': _reaper_stats['orphans_killed']
+        }
@@ -1,7 +1,6 @@
-from pymongo import MongoClient
 from datetime import datetime, timedelta
-from os import getenv, makedirs, path
-from dotenv import load_dotenv
+from os import makedirs, path
+from .mongo_service import get_client, get_database, get_collection, close_client
 import logging
 import time
 
@@ -22,15 +21,10 @@ class CleanupService:
         )
         self.logger = logging.getLogger(__name__)
         
-        # Connect to MongoDB
-        load_dotenv()
-        mongo_uri = getenv('MONGODB_URI')
-        if not mongo_uri:
-            raise ValueError("MONGODB_URI environment variable not set")
-            
-        self.client = MongoClient(mongo_uri)
-        self.db = self.client['fleatronics']
-        self.collection = self.db['listings']
+        # Connect to MongoDB through the shared pooled client
+        self.client = get_client()
+        self.db = get_database()
+        self.collection = get_collection()
 
     def cleanup_old_listings(self, months_old=2):
         """Delete listings older than specified months"""
@@ -68,8 +62,8 @@ class CleanupService:
             raise
         
     def close(self):
-        """Close the MongoDB connection"""
-        self.client.close()
+        """Release the MongoDB connection (the shared client is closed on shutdown)"""
+        self.client = None
 
 def run_cleanup_service():
     """Run the cleanup service as a standalone process"""
@@ -107,6 +101,7 @@ def run_cleanup_service():
     finally:
         if cleanup_service:
             cleanup_service.close()
+        close_client()
 
 if __name__ == "__main__":
     run_cleanup_service() 
\ No newline at end of file
@@ -0,0 +1,197 @@
+from os import getenv
+from urllib.parse import urlsplit
+from .crawl_state import crawl_key, get_crawl_state
+from .page_budget import category_pages
+from .rate_limiter import get_domain_limiter
+from .http_fetch import (HTTP2_AVAILABLE, HTTP_TIMEOUT, check_response, client_headers, httpx, is_bot_walled,
+                         parse_page, record_http_page, store_prefetched, uses_http)
+import asyncio
+import threading
+import time
+
+# The result pages of HTTP-capable sites (see http_fetch.py) are fetched ahead of the site scrapers,
+# all sites and categories at once. Fetched pages wait in a bounded queue for the parsers, and the
+# scrapers then pick them up instead of fetching them one by one (pages that failed go to the browser).
+# Request starts per domain are spaced out by the shared rate limiter (see rate_limiter.py).
+# Override with CRAWL_CONCURRENCY, CRAWL_PER_HOST, CRAWL_QUEUE_SIZE and CRAWL_PARSERS.
+CRAWL_CONCURRENCY = 8    # Requests in flight over all sites
+CRAWL_PER_HOST = 2       # Requests in flight per host
+CRAWL_QUEUE_SIZE = 8     # Fetched pages waiting for a parser, fetching pauses while it is full
+CRAWL_PARSERS = 2        # Pages parsed at once (in threads, so fetching goes on meanwhile)
+
+# Pages, timings and settings of the last crawl in the current run
+_crawl_stats = {}
+_stats_lock = threading.Lock()
+
+def _setting(name, default):
+    """Get a numeric crawl setting from the environment"""
+    try:
+        return type(default)(getenv(name, default))
+    except ValueError:
+        return default
+
+def get_crawl_settings():
+    """Get the configured crawl limits"""
+    return {
+        'concurrency': max(1, _setting('CRAWL_CONCURRENCY', CRAWL_CONCURRENCY)),
+        'per_host': max(1, _setting('CRAWL_PER_HOST', CRAWL_PER_HOST)),
+        'queue_size': max(1, _setting('CRAWL_QUEUE_SIZE', CRAWL_QUEUE_SIZE)),
+        'parsers': max(1, _setting('CRAWL_PARSERS', CRAWL_PARSERS))
+    }
+
+def reset_crawl_stats():
+    """Reset the crawl stats for a new scraper run"""
+    with _stats_lock:
+        _crawl_stats.clear()
+
+def get_crawl_stats():
+    """Get the pages fetched ahead, pages per second and queue depth for the current run"""
+    with _stats_lock:
+        return dict(_crawl_stats)
+
+class HostGate:
+    """Limits the requests in flight to one host and waits for its domain's rate limit"""
+
+    def __init__(self, limit, url):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.url = url
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        try:
+            await get_domain_limiter().acquire_async(self.url)
+        except BaseException:
+            self.semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.semaphore.release()
+
+def plan_pages(jobs):
+    """List (spec, page_url, category) for every page of the given (spec, max_pages) jobs"""
+    marks = get_crawl_state()
+    pages = []
+    for spec, max_pages in jobs:
+        # Sites that stop on a page's content are crawled page by page by their scraper
+        if spec.get('stop_when') or not uses_http(spec):
+            continue
+        for main_url, category in spec['urls']:
+            # As deep as the category went last run, the scraper fetches any further pages itself
+            budget = category_pages(spec['name'], category, max_pages)
+            pages_ahead = (marks.expected_pages(spec['name'], crawl_key(main_url, category), budget)
+                           if marks else budget)
+            for page in range(1, pages_ahead + 1):
+                pages.append((spec, spec['page_url'](main_url, page), category))
+    return pages
+
+async def _crawl(pages, settings, counts):
+    queue = asyncio.Queue(maxsize=settings['queue_size'])
+    total = asyncio.Semaphore(settings['concurrency'])
+    gates = {}
+    clients = {}
+    for spec, _, _ in pages:
+        if spec['name'] not in clients:
+            clients[spec['name']] = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                headers=client_headers(spec),
+                timeout=HTTP_TIMEOUT,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=settings['per_host'],
+                                    max_keepalive_connections=settings['per_host'])
+            )
+
+    async def fetch(spec, page_url, category):
+        site_name = spec['name']
+        host = urlsplit(page_url).netloc
+        if host not in gates:
+            gates[host] = HostGate(settings['per_host'], page_url)
+        gate = gates[host]
+        async with gate:
+            # The rest of a bot-walled site's pages go to the browser without another request
+            if is_bot_walled(site_name):
+                store_prefetched(site_name, page_url, None, 'bot_wall')
+                return
+            async with total:
+                start_time = time.time()
+                try:
+                    response = await clients[site_name].get(page_url)
+                except Exception as e:
+                    print(f"Warning: HTTP fetch of {site_name} page failed: {e}")
+                    store_prefetched(site_name, page_url, None, 'http_error')
+                    return
+                seconds = time.time() - start_time
+
+        reason = check_response(site_name, response)
+        if reason:
+            store_prefetched(site_name, page_url, None, reason)
+            return
+        await queue.put((spec, page_url, category, response.text, seconds, len(response.content)))
+        counts['max_queue_depth'] = max(counts['max_queue_depth'], queue.qsize())
+
+    async def parse_pages():
+        while True:
+            spec, page_url, category, html, seconds, size = await queue.get()
+            site_name = spec['name']
+            try:
+                listings = await asyncio.to_thread(parse_page, spec, html, category)
+                if listings:
+                    record_http_page(site_name, seconds, size)
+                    store_prefetched(site_name, page_url, listings)
+                    counts['pages'] += 1
+                else:
+                    # Cards rendered by JavaScript, or a changed layout
+                    store_prefetched(site_name, page_url, None, 'no_cards')
+            except Exception as e:
+                print(f"Error parsing {site_name} page {page_url}: {e}")
+                store_prefetched(site_name, page_url, None, 'parse_error')
+            finally:
+                queue.task_done()
+
+    parsers = [asyncio.create_task(parse_pages()) for _ in range(settings['parsers'])]
+    try:
+        await asyncio.gather(*(fetch(spec, page_url, category) for spec, page_url, category in pages))
+        await queue.join()
+    finally:
+        for parser in parsers:
+            parser.cancel()
+        await asyncio.gather(*parsers, return_exceptions=True)
+        for client in clients.values():
+            await client.aclose()
+
+def prefetch_pages(jobs):
+    """Fetch and parse the pages of every HTTP-capable site in jobs ([(spec, max_pages)]) concurrently
+
+    Results are kept for the site scrapers (see http_fetch.take_prefetched).
+    """
+    pages = plan_pages(jobs)
+    if not pages:
+        return
+
+    settings = get_crawl_settings()
+    sites = sorted({spec['name'] for spec, _, _ in pages})
+    print(f"Fetching {len(pages)} pages of {', '.join(sites)} ahead "
+          f"({settings['concurrency']} at once, {settings['per_host']} per host)")
+
+    counts = {'pages': 0, 'max_queue_depth': 0}
+    start_time = time.time()
+    try:
+        asyncio.run(_crawl(pages, settings, counts))
+    except Exception as e:
+        # Pages without a result are fetched by their scraper as usual
+        print(f"Warning: Crawl engine stopped: {e}")
+    seconds = time.time() - start_time
+
+    print(f"Fetched {counts['pages']}/{len(pages)} pages in {seconds:.1f}s "
+          f"({counts['pages'] / seconds if seconds else 0:.2f} pages/s)")
+    with _stats_lock:
+        _crawl_stats.update({
+            'sites': sites,
+            'planned_pages': len(pages),
+            'pages': counts['pages'],
+            'fallback_pages': len(pages) - counts['pages'],
+            'seconds': round(seconds, 2),
+            'pages_per_second': round(counts['pages'] / seconds, 2) if seconds else None,
+            'max_queue_depth': counts['max_queue_depth'],
+            **settings
+        })
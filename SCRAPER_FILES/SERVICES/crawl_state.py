@@ -0,0 +1,177 @@
+from os import getenv, makedirs, path
+import sqlite3
+import threading
+import time
+
+# Incremental crawling: every site/category keeps the links it has seen (its high-water mark), and its
+# pagination stops at the first page where at least INCREMENTAL_STOP_RATIO of the links are known.
+# With a mark, a category may go up to INCREMENTAL_PAGE_CAP_FACTOR times its SCRAPER_CONFIG pages,
+# so the pages crawled per cycle follow how fast new ads are posted. Set INCREMENTAL_CRAWL=0 to crawl
+# the configured pages only. Each setting can be overridden with the environment variable of the same name.
+CRAWL_STATE_CONFIG = {
+    'CRAWL_STATE_PATH': path.join(path.dirname(path.dirname(path.abspath(__file__))), 'cache', 'crawl_state.sqlite3'),
+    'INCREMENTAL_STOP_RATIO': 0.8,
+    'INCREMENTAL_PAGE_CAP_FACTOR': 3,
+    'INCREMENTAL_TTL_DAYS': 14,
+}
+INCREMENTAL_CRAWL = True
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH_SIZE = 500
+
+_crawl_state = None
+_state_lock = threading.Lock()
+
+# Pages crawled, known ratios and why pagination ended per site/category for the current run
+_incremental_stats = {}
+_stats_lock = threading.Lock()
+
+def is_incremental_enabled():
+    """Check whether incremental crawling is switched on"""
+    value = getenv('INCREMENTAL_CRAWL')
+    if value is None:
+        return INCREMENTAL_CRAWL
+    return value.strip().lower() not in ('0', 'false', 'no', 'off')
+
+def _setting(name):
+    default = CRAWL_STATE_CONFIG[name]
+    try:
+        return type(default)(getenv(name, default))
+    except ValueError:
+        return default
+
+def crawl_key(main_url, category):
+    """Get the key a site's category (or its URL, for sites without categories) is tracked under"""
+    return category or main_url
+
+def get_crawl_state():
+    """Get the process-wide crawl state (None when incremental crawling is off)"""
+    global _crawl_state
+    if not is_incremental_enabled():
+        return None
+    with _state_lock:
+        if _crawl_state is None:
+            _crawl_state = CrawlState()
+        return _crawl_state
+
+def reset_incremental_stats():
+    """Reset the incremental crawl stats for a new scraper run"""
+    with _stats_lock:
+        _incremental_stats.clear()
+
+def get_incremental_stats():
+    """Get pages crawled, page limit, known ratios and stop reason per site and category for the current run"""
+    with _stats_lock:
+        return {site: {key: dict(stats) for key, stats in keys.items()}
+                for site, keys in _incremental_stats.items()}
+
+class CrawlState:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or getenv('CRAWL_STATE_PATH', CRAWL_STATE_CONFIG['CRAWL_STATE_PATH'])
+        self.stop_ratio = _setting('INCREMENTAL_STOP_RATIO')
+        self.cap_factor = max(1, _setting('INCREMENTAL_PAGE_CAP_FACTOR'))
+        self.ttl_seconds = 24 * 60 * 60 * _setting('INCREMENTAL_TTL_DAYS')
+
+        makedirs(path.dirname(self.db_path), exist_ok=True)
+        self.lock = threading.Lock()
+        # Concurrent scraper processes share the file
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS seen_links (
+                    site TEXT NOT NULL,
+                    crawl_key TEXT NOT NULL,
+                    link TEXT NOT NULL,
+                    last_seen_at REAL NOT NULL,
+                    PRIMARY KEY (site, crawl_key, link)
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_seen_links_last_seen ON seen_links (last_seen_at)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS crawl_depths (
+                    site TEXT NOT NULL,
+                    crawl_key TEXT NOT NULL,
+                    pages INTEGER NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (site, crawl_key)
+                )
+            """)
+        self.evict()
+
+    def has_mark(self, site_name, key):
+        """Check whether a site/category has seen links to compare new pages with"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT 1 FROM seen_links WHERE site = ? AND crawl_key = ? LIMIT 1", (site_name, key)
+            ).fetchone() is not None
+
+    def page_limit(self, site_name, key, max_pages):
+        """Get how many pages a category may go to this run (the configured pages until it has a mark)"""
+        return max_pages * self.cap_factor if self.has_mark(site_name, key) else max_pages
+
+    def expected_pages(self, site_name, key, max_pages):
+        """Get how deep a category went last run, to fetch that many pages ahead"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT pages FROM crawl_depths WHERE site = ? AND crawl_key = ?", (site_name, key)
+            ).fetchone()
+        return min(row[0], self.page_limit(site_name, key, max_pages)) if row else max_pages
+
+    def known_links(self, site_name, key, links):
+        """Get which of the links the site/category has seen before"""
+        links = list(links)
+        known = set()
+        with self.lock:
+            for start in range(0, len(links), _LOOKUP_BATCH_SIZE):
+                batch = links[start:start + _LOOKUP_BATCH_SIZE]
+                placeholders = ','.join('?' * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT link FROM seen_links WHERE site = ? AND crawl_key = ? AND link IN ({placeholders})",
+                    [site_name, key, *batch]
+                ).fetchall()
+                known.update(row[0] for row in rows)
+        return known
+
+    def observe(self, site_name, key, page, listings, page_limit):
+        """Record a crawled page's links, returning True when the category's pagination should stop"""
+        links = {listing['link'] for listing in listings if listing.get('link')}
+        known_ratio = len(self.known_links(site_name, key, links)) / len(links) if links else None
+
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO seen_links (site, crawl_key, link, last_seen_at) VALUES (?, ?, ?, ?)",
+                [(site_name, key, link, now) for link in links]
+            )
+
+        stop = known_ratio is not None and known_ratio >= self.stop_ratio
+        with _stats_lock:
+            stats = _incremental_stats.setdefault(site_name, {}).setdefault(key, {
+                'pages': 0, 'page_limit': page_limit, 'known_ratios': [], 'stopped_by': None
+            })
+            stats['pages'] = max(stats['pages'], page)
+            stats['known_ratios'].append(round(known_ratio, 2) if known_ratio is not None else None)
+            if stop and not stats['stopped_by']:
+                stats['stopped_by'] = 'known_ratio'
+                print(f"{site_name}: {known_ratio:.0%} of page {page} already seen, stopping {key}")
+            elif page >= page_limit and not stats['stopped_by']:
+                stats['stopped_by'] = 'page_limit'
+        return stop
+
+    def save_depths(self, site_name):
+        """Store how deep each of the site's categories went this run"""
+        with _stats_lock:
+            depths = [(site_name, key, stats['pages'], time.time())
+                      for key, stats in _incremental_stats.get(site_name, {}).items() if stats['pages']]
+        if not depths:
+            return
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO crawl_depths (site, crawl_key, pages, updated_at) VALUES (?, ?, ?, ?)",
+                depths
+            )
+
+    def evict(self):
+        """Drop links not seen for longer than the TTL"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM seen_links WHERE last_seen_at < ?", (time.time() - self.ttl_seconds,))
@@ -1,28 +1,26 @@
-from pymongo import MongoClient
-from os import getenv
-from dotenv import load_dotenv
+from .mongo_service import get_client, get_database, get_collection
 
 class DatabaseService:
     def __init__(self):
-        load_dotenv()
-        mongo_uri = getenv('MONGODB_URI')
-        if not mongo_uri:
-            raise ValueError("MONGODB_URI environment variable not set")
-            
-        self.client = MongoClient(mongo_uri)
-        self.db = self.client['fleatronics']
-        self.collection = self.db['listings']
-
-    def check_duplicate_links(self, links, return_new_only=False):
-        """Check which links already exist in the database"""
+        # Borrow the process-wide pooled client instead of opening a new one
+        self.client = get_client()
+        self.db = get_database()
+        self.collection = get_collection()
+
+    def check_duplicate_links(self, links, return_new_only=False, source=None):
+        """Check which links already exist in the database (optionally for one source)"""
         if not links:
             return [] if return_new_only else []
         
         # Query MongoDB for existing links
+        query = {'link': {'$in': links}}
+        if source:
+            # Matches the unique (link, source) index
+            query['source'] = source
         existing_links = set(
             doc['link'] for doc in self.collection.find(
-                {'link': {'$in': links}}, 
-                {'link': 1}
+                query, 
+                {'link': 1, '_id': 0}
             )
         )
         
@@ -33,6 +31,36 @@ class DatabaseService:
             # Return list of duplicates (in database)
             return [link for link in links if link in existing_links]
 
+    def filter_new_listings(self, site_name, data):
+        """Drop listings whose (link, source) is already stored, using one lookup per call
+
+        Returns the remaining pages and per-category stats for the dropped listings,
+        in the same shape as upload_data_to_mongo's category stats.
+        """
+        links = list({item['link'] for page in data.values() for item in page if item.get('link')})
+        known_links = set(self.check_duplicate_links(links, source=site_name))
+
+        new_data = {}
+        known_stats = {}
+        for page, items in data.items():
+            new_items = []
+            for item in items:
+                if item.get('link') not in known_links:
+                    new_items.append(item)
+                    continue
+
+                category = item.get('category', 'uncategorized')
+                if category not in known_stats:
+                    known_stats[category] = {'total': 0, 'new': 0, 'complete': 0}
+                known_stats[category]['total'] += 1
+                if (item.get('main_image') and
+                    item.get('title', {}).get('original')):
+                    known_stats[category]['complete'] += 1
+            if new_items:
+                new_data[page] = new_items
+
+        return new_data, known_stats
+
     def close(self):
-        """Close the MongoDB connection"""
-        self.client.close() 
\ No newline at end of file
+        """Release the MongoDB connection (the shared client is closed on shutdown)"""
+        self.client = None 
\ No newline at end of file
@@ -0,0 +1,109 @@
+from datetime import datetime
+from .browser_supervisor import browser_processes, check_recycle, kill_browser, release_browser, track_browser
+from .resource_policy import apply_resource_policy
+import atexit
+import threading
+import time
+
+# One live browser per site, kept between scraper runs while it stays healthy
+_drivers = {}
+# Per-driver scratch state (e.g. whether cookies were accepted), reset with the driver
+_driver_state = {}
+_site_locks = {}
+_lock = threading.Lock()
+
+# Startup time of every driver created in the current run
+_startup_log = []
+
+def _site_lock(site_name):
+    """Get the lock guarding a single site's driver"""
+    with _lock:
+        if site_name not in _site_locks:
+            _site_locks[site_name] = threading.Lock()
+        return _site_locks[site_name]
+
+def is_driver_healthy(driver):
+    """Check that the browser session still answers commands"""
+    try:
+        driver.current_url
+        return True
+    except Exception:
+        return False
+
+def _quit(site_name, driver):
+    """Quit a driver, ignoring errors from an already dead browser, and kill any of its processes left over"""
+    processes = browser_processes(site_name)
+    try:
+        driver.quit()
+    except Exception as e:
+        print(f"Warning: Error while closing {site_name} driver: {e}")
+    release_browser(site_name, processes)
+
+def get_driver(site_name, factory):
+    """Get the site's driver, starting one with factory() on first use, if the old one died or
+    if it is due for recycling (see browser_supervisor.py)"""
+    with _site_lock(site_name):
+        driver = _drivers.get(site_name)
+        if driver is not None:
+            if not is_driver_healthy(driver):
+                print(f"{site_name} driver stopped responding, starting a new one")
+            elif not check_recycle(site_name):
+                return driver
+            _quit(site_name, driver)
+            _drivers.pop(site_name, None)
+
+        start_time = time.time()
+        driver = factory()
+        startup_seconds = time.time() - start_time
+        if driver is None:
+            return None
+
+        apply_resource_policy(site_name, driver)
+        track_browser(site_name, driver)
+        _drivers[site_name] = driver
+        # Cleared in place, callers may hold the state from before the driver started
+        _driver_state.setdefault(site_name, {}).clear()
+        _startup_log.append({
+            'site': site_name,
+            'startup_seconds': round(startup_seconds, 2),
+            'created_at': datetime.now().isoformat()
+        })
+        print(f"Started {site_name} driver in {startup_seconds:.1f}s")
+        return driver
+
+def get_driver_state(site_name):
+    """Get the scratch state of the site's current driver (empty for a fresh driver)"""
+    return _driver_state.setdefault(site_name, {})
+
+def quit_driver(site_name):
+    """Quit the site's driver so the next get_driver call starts a fresh one"""
+    with _site_lock(site_name):
+        driver = _drivers.pop(site_name, None)
+        # Cleared in place, like get_driver does
+        _driver_state.get(site_name, {}).clear()
+        if driver is not None:
+            _quit(site_name, driver)
+
+def kill_driver(site_name):
+    """Force a stuck site's browser down without waiting on its lock (the next get_driver replaces it)"""
+    if kill_browser(site_name):
+        return
+    driver = _drivers.get(site_name)
+    if driver is not None:
+        # Without psutil, quit in a thread of its own in case the session hangs as well
+        threading.Thread(target=_quit, args=(site_name, driver), daemon=True).start()
+
+def quit_all_drivers():
+    """Quit every driver (called on shutdown)"""
+    for site_name in list(_drivers):
+        quit_driver(site_name)
+
+def reset_driver_stats():
+    """Reset the startup log for a new scraper run"""
+    _startup_log.clear()
+
+def get_driver_stats():
+    """Get the startup time of every driver created in the current run"""
+    return list(_startup_log)
+
+atexit.register(quit_all_drivers)
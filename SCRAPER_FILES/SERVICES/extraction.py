@@ -0,0 +1,184 @@
+from os import getenv
+from .parse_backend import build_listings, get_parse_backend, parse_listings
+from .site_spec import build_card_listing
+import threading
+import time
+
+# How listing cards are read from a loaded page (override with EXTRACTION_MODE):
+#   'js'        - one execute_script call returns the cards as JSON, page_source only if that fails
+#   'source'    - always serialize page_source and parse it with the site's parse backend (parse_backend.py)
+#   'benchmark' - run both, use the JS result and record the timings and differences of both paths,
+#                 and of BeautifulSoup against the site's parse backend
+EXTRACTION_MODE = 'js'
+EXTRACTION_MODES = ('js', 'source', 'benchmark')
+
+# Runs in the page with the card part of a site spec (see site_spec.py):
+#   {'card': <css selector of one listing card>,
+#    'fields': {<name>: {'selector': <css, relative to the card; omit for the card itself>,
+#                        'attr': <attribute to read; omit for the text>,
+#                        'equals': <keep only nodes with exactly this text>,
+#                        'contains': <keep only nodes whose text contains this; without a
+#                                     selector this searches the card's text nodes>,
+#                        'last': <take the last match instead of the first>,
+#                        'all': <return every match as a list>,
+#                        'exists': <return whether anything matched>}}}
+# Text is read like BeautifulSoup's get_text(strip=True): stripped text nodes joined together.
+_EXTRACT_SCRIPT = r"""
+const spec = arguments[0];
+
+function strippedText(node) {
+    if (node.nodeType === Node.TEXT_NODE) return node.nodeValue.trim();
+    const walker = document.createTreeWalker(node, NodeFilter.SHOW_TEXT);
+    const parts = [];
+    while (walker.nextNode()) {
+        const text = walker.currentNode.nodeValue.trim();
+        if (text) parts.push(text);
+    }
+    return parts.join('');
+}
+
+function matches(card, rule) {
+    if (!rule.selector && rule.contains !== undefined) {
+        const walker = document.createTreeWalker(card, NodeFilter.SHOW_TEXT);
+        const nodes = [];
+        while (walker.nextNode()) {
+            if (walker.currentNode.nodeValue.includes(rule.contains)) nodes.push(walker.currentNode);
+        }
+        return nodes;
+    }
+    let nodes = rule.selector ? Array.from(card.querySelectorAll(rule.selector)) : [card];
+    if (rule.equals !== undefined) nodes = nodes.filter((node) => strippedText(node) === rule.equals);
+    if (rule.contains !== undefined) nodes = nodes.filter((node) => strippedText(node).includes(rule.contains));
+    return nodes;
+}
+
+function read(node, rule) {
+    if (rule.attr && node.nodeType === Node.ELEMENT_NODE) return node.getAttribute(rule.attr);
+    return strippedText(node);
+}
+
+return Array.from(document.querySelectorAll(spec.card)).map((card) => {
+    const item = {};
+    for (const [name, rule] of Object.entries(spec.fields)) {
+        const nodes = matches(card, rule);
+        if (rule.exists) {
+            item[name] = nodes.length > 0;
+        } else if (rule.all) {
+            item[name] = nodes.map((node) => read(node, rule));
+        } else {
+            const node = rule.last ? nodes[nodes.length - 1] : nodes[0];
+            item[name] = node ? read(node, rule) : null;
+        }
+    }
+    return item;
+});
+"""
+
+# Pages, timings and fallbacks per site and path for the current run
+_extraction_stats = {}
+_stats_lock = threading.Lock()
+
+def get_extraction_mode():
+    """Get the configured extraction mode"""
+    mode = getenv('EXTRACTION_MODE', EXTRACTION_MODE).strip().lower()
+    return mode if mode in EXTRACTION_MODES else EXTRACTION_MODE
+
+def _site_stats(site_name):
+    return _extraction_stats.setdefault(site_name, {
+        'js_seconds': [], 'source_seconds': [], 'soup_seconds': [], 'fallbacks': 0,
+        'benchmark_mismatches': 0, 'backend_mismatches': 0
+    })
+
+def reset_extraction_stats():
+    """Reset the extraction stats for a new scraper run"""
+    with _stats_lock:
+        _extraction_stats.clear()
+
+def get_extraction_stats():
+    """Get page counts, average parse time per path and fallbacks per site for the current run"""
+    with _stats_lock:
+        stats = {}
+        for site, site_stats in _extraction_stats.items():
+            stats[site] = {'parse_backend': get_parse_backend(site), 'fallbacks': site_stats['fallbacks']}
+            for path in ('js', 'source', 'soup'):
+                seconds = site_stats[f'{path}_seconds']
+                stats[site][f'{path}_pages'] = len(seconds)
+                stats[site][f'{path}_avg_seconds'] = round(sum(seconds) / len(seconds), 3) if seconds else None
+            if get_extraction_mode() == 'benchmark':
+                stats[site]['benchmark_mismatches'] = site_stats['benchmark_mismatches']
+                stats[site]['backend_mismatches'] = site_stats['backend_mismatches']
+        return stats
+
+def record_source_parse(site_name, seconds):
+    """Record a page_source parse done outside extract_page (e.g. in a parse worker)"""
+    with _stats_lock:
+        _site_stats(site_name)['source_seconds'].append(seconds)
+
+def extract_cards(driver, spec):
+    """Read the raw card fields of the current page in one script call (None if it fails)"""
+    try:
+        return driver.execute_script(_EXTRACT_SCRIPT, {'card': spec['card'], 'fields': spec['fields']})
+    except Exception as e:
+        print(f"Warning: In-browser extraction failed: {e}")
+        return None
+
+def _comparable(listings):
+    # Relative post times ("2 hours ago") resolve against the clock, so leave timestamps out
+    return [{key: value for key, value in listing.items() if key != 'timestamp'} for listing in listings]
+
+def extract_page(driver, spec, category=None, pipeline=None):
+    """Extract the listings of the loaded page with the site spec
+
+    With a parse pipeline (parse_pool.py) a page_source parse is handed to it, and what its
+    submit returns (the listings, or a future of them) is returned instead.
+    """
+    site_name = spec['name']
+    build_listing = lambda raw: build_card_listing(spec, raw, category)
+    mode = get_extraction_mode()
+    listings = None
+
+    if mode in ('js', 'benchmark'):
+        start_time = time.time()
+        raw_cards = extract_cards(driver, spec)
+        # No cards usually means the selectors no longer match, so let the page_source parse try
+        if raw_cards:
+            listings = build_listings(site_name, raw_cards, build_listing)
+            with _stats_lock:
+                _site_stats(site_name)['js_seconds'].append(time.time() - start_time)
+
+    if listings is None or mode in ('source', 'benchmark'):
+        page_source = driver.page_source
+        if pipeline is not None and mode != 'benchmark':
+            if listings is None and mode != 'source':
+                with _stats_lock:
+                    _site_stats(site_name)['fallbacks'] += 1
+                print(f"Warning: In-browser extraction found no {site_name} cards, parsed page_source")
+            return pipeline.submit(spec, page_source, category)
+
+        start_time = time.time()
+        source_listings = parse_listings(site_name, page_source, spec, build_listing)
+        with _stats_lock:
+            site_stats = _site_stats(site_name)
+            site_stats['source_seconds'].append(time.time() - start_time)
+            if listings is None:
+                if mode != 'source':
+                    site_stats['fallbacks'] += 1
+                    print(f"Warning: In-browser extraction found no {site_name} cards, parsed page_source")
+                listings = source_listings
+            elif ({listing.get('link') for listing in listings} !=
+                  {listing.get('link') for listing in source_listings}):
+                site_stats['benchmark_mismatches'] += 1
+                print(f"Benchmark: {site_name} JS extraction found {len(listings)} listings, "
+                      f"page_source {len(source_listings)}")
+
+        if mode == 'benchmark' and get_parse_backend(site_name) != 'soup':
+            start_time = time.time()
+            soup_listings = parse_listings(site_name, page_source, spec, build_listing, backend='soup')
+            with _stats_lock:
+                site_stats['soup_seconds'].append(time.time() - start_time)
+                if _comparable(soup_listings) != _comparable(source_listings):
+                    site_stats['backend_mismatches'] += 1
+                    print(f"Benchmark: {site_name} {get_parse_backend(site_name)} listings differ from "
+                          f"BeautifulSoup ({len(source_listings)} vs {len(soup_listings)})")
+
+    return listings
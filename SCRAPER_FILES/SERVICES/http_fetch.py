@@ -0,0 +1,239 @@
+from os import getenv
+from .parse_backend import parse_listings
+from .rate_limiter import wait_for_domain
+from .site_spec import build_card_listing
+import atexit
+import re
+import threading
+import time
+
+# httpx is optional, without it every page goes through the browser. HTTP/2 also needs the h2 package.
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Server-rendered search pages are fetched with a plain GET before starting a browser.
+# Set HTTP_FETCH=0 to always use the browser (e.g. to compare load times).
+HTTP_FETCH = True
+
+# A site spec's 'http' entry switches this on for the site:
+#   'accept_language' - Accept-Language header sent with every request
+#   'headers'         - any extra headers
+HTTP_TIMEOUT = 15
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36")
+BASE_HEADERS = {
+    'User-Agent': USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+    'Accept-Encoding': 'gzip, deflate',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+# Responses that mean a bot check answered instead of the search page: a blocking status together with
+# a challenge script, or a challenge page title. Words like 'captcha' or 'cloudflare' alone show up in
+# the scripts and footers of ordinary result pages, so they aren't enough.
+BOT_WALL_STATUSES = (401, 403, 429, 503)
+BOT_WALL_MARKERS = ('cf-chl', 'cf_chl_opt', '/cdn-cgi/challenge-platform/', 'captcha-delivery.com',
+                    'px-captcha', 'geo.captcha-delivery')
+BOT_WALL_TITLES = ('just a moment', 'attention required', 'access denied', 'are you a robot',
+                   'pardon our interruption', 'security check', 'captcha')
+_TITLE_PATTERN = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+
+# One keep-alive client per site, reused across pages and runs
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Sites that hit a bot wall this run, their remaining pages go straight to the browser
+_walled_sites = set()
+
+# Pages fetched ahead by the crawl engine, {site: {page_url: (listings, fallback reason)}}
+_prefetched = {}
+
+# Pages served per path, fallback reasons and page timings per site for the current run
+_fetch_stats = {}
+_stats_lock = threading.Lock()
+
+def is_http_fetch_enabled():
+    """Check whether HTTP-first fetching is switched on"""
+    value = getenv('HTTP_FETCH')
+    if value is None:
+        return HTTP_FETCH
+    return value.strip().lower() not in ('0', 'false', 'no', 'off')
+
+def uses_http(spec):
+    """Check whether a site's pages are tried over plain HTTP before the browser"""
+    return bool(spec.get('http')) and httpx is not None and is_http_fetch_enabled()
+
+def _site_stats(site_name):
+    return _fetch_stats.setdefault(site_name, {
+        'http_seconds': [], 'http_bytes': 0, 'browser_seconds': [], 'fallbacks': {}
+    })
+
+def reset_fetch_stats():
+    """Reset the fetch stats, bot-walled sites and prefetched pages for a new scraper run"""
+    with _stats_lock:
+        _fetch_stats.clear()
+        _walled_sites.clear()
+        _prefetched.clear()
+
+def get_fetch_stats():
+    """Get how many pages HTTP and the browser served, with fallback reasons and timings, per site"""
+    with _stats_lock:
+        stats = {}
+        for site, site_stats in _fetch_stats.items():
+            http_seconds = site_stats['http_seconds']
+            browser_seconds = site_stats['browser_seconds']
+            pages = len(http_seconds) + len(browser_seconds)
+            stats[site] = {
+                'http_pages': len(http_seconds),
+                'browser_pages': len(browser_seconds),
+                'http_share': round(len(http_seconds) / pages, 2) if pages else None,
+                'http_avg_seconds': round(sum(http_seconds) / len(http_seconds), 2) if http_seconds else None,
+                'http_avg_kb': round(site_stats['http_bytes'] / len(http_seconds) / 1024, 1) if http_seconds else None,
+                'browser_avg_seconds': (round(sum(browser_seconds) / len(browser_seconds), 2)
+                                        if browser_seconds else None),
+                'fallbacks': dict(site_stats['fallbacks']),
+                'bot_walled': site in _walled_sites
+            }
+        return stats
+
+def record_http_page(site_name, seconds, size):
+    """Record a page served over HTTP"""
+    with _stats_lock:
+        site_stats = _site_stats(site_name)
+        site_stats['http_seconds'].append(seconds)
+        site_stats['http_bytes'] += size
+
+def record_browser_page(site_name, seconds, reason=None):
+    """Record a page of an HTTP-capable site that the browser served, and why"""
+    with _stats_lock:
+        site_stats = _site_stats(site_name)
+        site_stats['browser_seconds'].append(seconds)
+        if reason:
+            site_stats['fallbacks'][reason] = site_stats['fallbacks'].get(reason, 0) + 1
+
+def store_prefetched(site_name, page_url, listings, reason=None):
+    """Keep a page fetched ahead (or the reason it needs the browser) for the site's scraper"""
+    with _stats_lock:
+        _prefetched.setdefault(site_name, {})[page_url] = (listings, reason)
+
+def take_prefetched(site_name, page_url):
+    """Take a prefetched page as (listings, fallback reason), None if it wasn't fetched ahead"""
+    with _stats_lock:
+        return _prefetched.get(site_name, {}).pop(page_url, None)
+
+def pop_site_prefetched(site_name):
+    """Take all of a site's prefetched pages, to hand them to the process that runs its scraper"""
+    with _stats_lock:
+        return _prefetched.pop(site_name, {})
+
+def load_prefetched(site_name, pages):
+    """Add pages prefetched in another process"""
+    with _stats_lock:
+        _prefetched.setdefault(site_name, {}).update(pages)
+
+def client_headers(spec):
+    """Get the request headers for a site"""
+    headers = dict(BASE_HEADERS)
+    if spec['http'].get('accept_language'):
+        headers['Accept-Language'] = spec['http']['accept_language']
+    headers.update(spec['http'].get('headers', {}))
+    return headers
+
+def _get_client(spec):
+    """Get the site's pooled client, creating it on first use"""
+    site_name = spec['name']
+    with _clients_lock:
+        client = _clients.get(site_name)
+        if client is None:
+            client = httpx.Client(
+                http2=HTTP2_AVAILABLE,
+                headers=client_headers(spec),
+                timeout=HTTP_TIMEOUT,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=4)
+            )
+            _clients[site_name] = client
+        return client
+
+def close_http_clients():
+    """Close every pooled client (called on shutdown)"""
+    with _clients_lock:
+        for client in _clients.values():
+            try:
+                client.close()
+            except Exception:
+                pass
+        _clients.clear()
+
+def is_bot_wall(response):
+    """Check whether a response is a bot check rather than the search page"""
+    head = response.text[:20000].lower()
+    title = _TITLE_PATTERN.search(head)
+    if title and any(wall_title in title.group(1) for wall_title in BOT_WALL_TITLES):
+        return True
+    # Other failed statuses fall back to the browser page by page (see check_response)
+    if response.status_code in BOT_WALL_STATUSES:
+        return any(marker in head for marker in BOT_WALL_MARKERS)
+    return False
+
+def is_bot_walled(site_name):
+    """Check whether a site hit a bot wall earlier in this run"""
+    return site_name in _walled_sites
+
+def check_response(site_name, response):
+    """Get why a response can't be parsed as a results page (None if it can)"""
+    if is_bot_wall(response):
+        with _stats_lock:
+            first_wall = site_name not in _walled_sites
+            _walled_sites.add(site_name)
+        if first_wall:
+            print(f"{site_name} answered HTTP with a bot check (status {response.status_code}), "
+                  f"using the browser for the rest of this run")
+        return 'bot_wall'
+    if response.status_code != 200:
+        return f'status_{response.status_code}'
+    return None
+
+def parse_page(spec, html, category=None):
+    """Parse a fetched results page into listings"""
+    return parse_listings(spec['name'], html, spec, lambda raw: build_card_listing(spec, raw, category))
+
+def fetch_listings(spec, page_url, category=None):
+    """Fetch a results page over HTTP and parse its cards
+
+    Returns (listings, None), or (None, reason) when the browser should load the page instead:
+    'bot_wall', 'http_error', 'status_<code>' or 'no_cards'.
+    """
+    site_name = spec['name']
+    if site_name in _walled_sites:
+        return None, 'bot_wall'
+
+    wait_for_domain(page_url)
+    start_time = time.time()
+    try:
+        response = _get_client(spec).get(page_url)
+    except Exception as e:
+        print(f"Warning: HTTP fetch of {site_name} page failed: {e}")
+        return None, 'http_error'
+
+    reason = check_response(site_name, response)
+    if reason:
+        return None, reason
+
+    listings = parse_page(spec, response.text, category)
+    if not listings:
+        # Cards rendered by JavaScript, or a changed layout
+        return None, 'no_cards'
+
+    record_http_page(site_name, time.time() - start_time, len(response.content))
+    return listings, None
+
+atexit.register(close_http_clients)
@@ -0,0 +1,139 @@
+from pymongo import MongoClient, monitoring
+from os import getenv, getpid
+from dotenv import load_dotenv
+import atexit
+import threading
+
+# Connection pool settings, each can be overridden with the matching MONGO_* environment variable
+MONGO_CONFIG = {
+    'MONGO_MAX_POOL_SIZE': 20,
+    'MONGO_MIN_POOL_SIZE': 0,
+    'MONGO_CONNECT_TIMEOUT_MS': 10000,
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS': 10000,
+    'MONGO_SOCKET_TIMEOUT_MS': 60000,
+}
+
+DATABASE_NAME = 'fleatronics'
+LISTINGS_COLLECTION = 'listings'
+
+_client = None
+_client_pid = None
+_indexes_ready = False
+_lock = threading.Lock()
+
+# Counters for the current run
+_connection_stats = {'clients_created': 0, 'connections_opened': 0}
+
+class _ConnectionCounter(monitoring.ConnectionPoolListener):
+    """Count the sockets the pool opens so connection setup shows up in the run stats"""
+
+    def connection_created(self, event):
+        _connection_stats['connections_opened'] += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+    def connection_checked_out(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+def get_mongo_setting(name):
+    """Get a pool setting from the environment, falling back to MONGO_CONFIG"""
+    try:
+        return int(getenv(name, MONGO_CONFIG[name]))
+    except ValueError:
+        return MONGO_CONFIG[name]
+
+def get_client():
+    """Get the process-wide MongoClient, creating it on first use"""
+    global _client, _client_pid, _indexes_ready
+    # A client inherited through fork is not safe to use, so each process builds its own
+    if _client is not None and _client_pid == getpid():
+        return _client
+
+    with _lock:
+        if _client is not None and _client_pid == getpid():
+            return _client
+
+        load_dotenv()
+        mongo_uri = getenv('MONGODB_URI')
+        if not mongo_uri:
+            raise ValueError("MONGODB_URI environment variable not set")
+
+        _client = MongoClient(
+            mongo_uri,
+            maxPoolSize=get_mongo_setting('MONGO_MAX_POOL_SIZE'),
+            minPoolSize=get_mongo_setting('MONGO_MIN_POOL_SIZE'),
+            connectTimeoutMS=get_mongo_setting('MONGO_CONNECT_TIMEOUT_MS'),
+            serverSelectionTimeoutMS=get_mongo_setting('MONGO_SERVER_SELECTION_TIMEOUT_MS'),
+            socketTimeoutMS=get_mongo_setting('MONGO_SOCKET_TIMEOUT_MS'),
+            event_listeners=[_ConnectionCounter()]
+        )
+        _client_pid = getpid()
+        _indexes_ready = False
+        _connection_stats['clients_created'] += 1
+        return _client
+
+def get_database():
+    """Get the fleatronics database from the shared client"""
+    return get_client()[DATABASE_NAME]
+
+def get_collection(name=LISTINGS_COLLECTION):
+    """Get a collection from the shared client"""
+    return get_database()[name]
+
+def get_listings_collection():
+    """Get the listings collection, making sure its unique (link, source) index exists"""
+    global _indexes_ready
+    collection = get_collection(LISTINGS_COLLECTION)
+    if not _indexes_ready:
+        # Create a unique compound index
+        collection.create_index([
+            ("link", 1),
+            ("source", 1)
+        ], unique=True)
+        _indexes_ready = True
+    return collection
+
+def close_client():
+    """Close the shared client (called on shutdown)"""
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+def reset_connection_stats():
+    """Reset the connection counters for a new scraper run"""
+    _connection_stats['clients_created'] = 0
+    _connection_stats['connections_opened'] = 0
+
+def get_connection_stats():
+    """Get the connection counters for the current run"""
+    return dict(_connection_stats)
+
+atexit.register(close_client)
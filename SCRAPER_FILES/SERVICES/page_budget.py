@@ -0,0 +1,177 @@
+from os import getenv, path
+import json
+import math
+import re
+import threading
+
+# Each site/category's pages for the next run, from the new-ad ratios logged in logs/scraper_stats.json.
+# A category whose recent runs were almost all new ads is falling behind and gets more pages, one that
+# keeps re-reading known ads gets fewer. The goal is for about PAGE_BUDGET_TARGET_OVERLAP of a run's ads
+# to be known already, which shows the run reached back to where the last one started.
+# SCRAPER_CONFIG gives the pages of categories without history. Each setting can be overridden with the
+# environment variable of the same name, and PAGE_BUDGET=0 uses SCRAPER_CONFIG as is.
+BUDGET_CONFIG = {
+    'PAGE_BUDGET_LOG': path.join(path.dirname(path.dirname(path.abspath(__file__))), 'logs', 'scraper_stats.json'),
+    'PAGE_BUDGET_WINDOW': 6,           # Most recent runs of a category that are looked at
+    'PAGE_BUDGET_TARGET_OVERLAP': 0.3,
+    'PAGE_BUDGET_MIN_PAGES': 1,
+    'PAGE_BUDGET_MAX_PAGES': 12,
+    'PAGE_BUDGET_MAX_STEP': 2.0,       # Largest factor the pages change by from one run to the next
+}
+PAGE_BUDGET = True
+
+# Categories logged without a name
+UNCATEGORIZED = 'uncategorized'
+
+_NEW_ADS_PATTERN = re.compile(r'\((\d+)/(\d+)\)')
+
+# {site: {category: pages}} of the current run, and how each was decided
+_category_budgets = {}
+_budget_decisions = {}
+_budget_lock = threading.Lock()
+
+def is_budget_enabled():
+    """Check whether the page budget planner is switched on"""
+    value = getenv('PAGE_BUDGET')
+    if value is None:
+        return PAGE_BUDGET
+    return value.strip().lower() not in ('0', 'false', 'no', 'off')
+
+def _setting(name):
+    default = BUDGET_CONFIG[name]
+    try:
+        return type(default)(getenv(name, default))
+    except ValueError:
+        return default
+
+def parse_new_ads(text):
+    """Get (new, total) from a logged new-ads entry like "54.7% new ads (1055/1929)", None if unreadable"""
+    match = _NEW_ADS_PATTERN.search(text or '')
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+def load_history(log_file=None):
+    """Read the logged runs, oldest first (empty if the log is missing or unreadable)"""
+    log_file = log_file or _setting('PAGE_BUDGET_LOG')
+    try:
+        with open(log_file, 'r') as f:
+            content = f.read()
+        history = json.loads(content) if content.strip() else []
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not read scraper history for page budgets: {e}")
+        return []
+    return history if isinstance(history, list) else []
+
+def plan_category(site_name, category, runs, default_pages):
+    """Work out a category's next pages from its recent runs, returning the decision"""
+    # The pages the latest run was given, where a run before the planner used SCRAPER_CONFIG
+    previous = default_pages
+    for entry in reversed(runs):
+        decision = (entry.get('page_budget') or {}).get(f"{site_name} - {category}")
+        if decision:
+            previous = decision['pages']
+            break
+
+    counts = [parse_new_ads(entry['new_ads'][f"{site_name} - {category}"]) for entry in runs]
+    counts = [count for count in counts if count and count[1]]
+    if not counts:
+        return {'pages': default_pages, 'previous': previous, 'new_ratio': None, 'runs': 0,
+                'reason': 'no history'}
+
+    # Each run counts the same, so a first run's backfill of thousands of ads doesn't drown the rest
+    new_ratio = sum(new / total for new, total in counts) / len(counts)
+    target_ratio = 1 - _setting('PAGE_BUDGET_TARGET_OVERLAP')
+    max_step = max(1.0, _setting('PAGE_BUDGET_MAX_STEP'))
+    # The known ads scale with the pages crawled while the new ones don't, so scale the pages
+    # by how far the new-ad ratio is from the target
+    wanted = previous * new_ratio / target_ratio if target_ratio > 0 else previous
+    wanted = min(max(wanted, previous / max_step), previous * max_step)
+    pages = min(max(math.ceil(wanted), _setting('PAGE_BUDGET_MIN_PAGES')), _setting('PAGE_BUDGET_MAX_PAGES'))
+
+    if pages > previous:
+        reason = 'falling behind'
+    elif pages < previous:
+        reason = 'over-crawling'
+    else:
+        reason = 'on target'
+    return {'pages': pages, 'previous': previous, 'new_ratio': round(new_ratio, 3), 'runs': len(counts),
+            'reason': reason}
+
+def plan_page_budgets(default_config, history=None):
+    """Plan each site/category's pages for the next run from the logged new-ad ratios
+
+    Returns {site: pages} for the scrapers (a site's largest category budget), the per-category
+    pages are applied through category_pages().
+    """
+    if not is_budget_enabled():
+        return dict(default_config)
+    history = load_history() if history is None else history
+    window = max(1, _setting('PAGE_BUDGET_WINDOW'))
+
+    # The recent runs of each logged site/category
+    category_runs = {}
+    for entry in reversed(history):
+        for key in (entry.get('new_ads') or {}):
+            site_name, _, category = key.partition(' - ')
+            runs = category_runs.setdefault((site_name, category or UNCATEGORIZED), [])
+            if len(runs) < window:
+                runs.insert(0, entry)
+
+    budgets = {}
+    decisions = {}
+    for (site_name, category), runs in category_runs.items():
+        if site_name not in default_config:
+            continue
+        decision = plan_category(site_name, category, runs, default_config[site_name])
+        budgets.setdefault(site_name, {})[category] = decision['pages']
+        decisions[f"{site_name} - {category}"] = decision
+
+    # Only the planned sites' budgets are replaced, sites planned on their own may be running meanwhile
+    with _budget_lock:
+        _drop_sites(default_config)
+        _category_budgets.update(budgets)
+        _budget_decisions.update(decisions)
+
+    print("\n=== Page budget ===")
+    for key, decision in sorted(decisions.items()):
+        ratio = f"{decision['new_ratio']:.0%} new" if decision['new_ratio'] is not None else 'no history'
+        print(f"{key}: {decision['previous']} -> {decision['pages']} pages "
+              f"({ratio} over {decision['runs']} runs, {decision['reason']})")
+
+    return {site_name: max(budgets[site_name].values()) if site_name in budgets else pages
+            for site_name, pages in default_config.items()}
+
+def category_pages(site_name, category, max_pages):
+    """Get a category's planned pages (max_pages when it has no budget)"""
+    with _budget_lock:
+        return _category_budgets.get(site_name, {}).get(category or UNCATEGORIZED, max_pages)
+
+def get_category_budgets(site_name):
+    """Get a site's planned pages per category, to hand them to the process that runs its scraper"""
+    with _budget_lock:
+        return dict(_category_budgets.get(site_name, {}))
+
+def set_category_budgets(site_name, budgets):
+    """Use category budgets planned in another process"""
+    with _budget_lock:
+        _category_budgets[site_name] = dict(budgets)
+
+def _drop_sites(sites):
+    for site_name in sites:
+        _category_budgets.pop(site_name, None)
+        for key in [key for key in _budget_decisions if key.partition(' - ')[0] == site_name]:
+            del _budget_decisions[key]
+
+def reset_budget_decisions(sites=None):
+    """Forget the previous run's budgets (of some sites, or of every site)"""
+    with _budget_lock:
+        if sites is None:
+            _category_budgets.clear()
+            _budget_decisions.clear()
+        else:
+            _drop_sites(sites)
+
+def get_budget_decisions(site_name=None):
+    """Get each site/category's planned pages and why, for the run log (read back by the next plan)"""
+    with _budget_lock:
+        return {key: dict(decision) for key, decision in _budget_decisions.items()
+                if site_name is None or key.partition(' - ')[0] == site_name}
@@ -0,0 +1,151 @@
+from os import getenv
+from .resource_policy import record_page_transfer
+import threading
+import time
+
+# Readiness settings, each can be overridden with the environment variable of the same name
+READINESS_CONFIG = {
+    'PAGE_READY_DEADLINE_SECONDS': 15.0,  # Hard limit for one page, ready or not
+    'PAGE_READY_SETTLE_MS': 400,          # Quiet time (no new cards, no image changes) that counts as ready
+    'PAGE_READY_STEP_MS': 100,            # Minimum time between scroll steps
+}
+
+# Runs in the page: scrolls a viewport at a time while a MutationObserver notes DOM and image
+# source changes and an IntersectionObserver tracks the card images that come into view.
+# Resolves once the page is at the bottom, no card image is still loading and nothing
+# has changed for settleMs, or when the deadline passes.
+_READY_SCRIPT = r"""
+const [cardSelector, settleMs, stepMs, deadlineMs, forceLazyImages] = arguments;
+const done = arguments[arguments.length - 1];
+const start = performance.now();
+let lastChange = start;
+let lastScroll = 0;
+let lastCount = -1;
+
+const mutations = new MutationObserver(() => { lastChange = performance.now(); });
+mutations.observe(document.documentElement, {
+    childList: true, subtree: true, attributes: true, attributeFilter: ['src', 'srcset']
+});
+
+const loading = new Set();
+const visible = new IntersectionObserver((entries) => {
+    for (const entry of entries) {
+        if (!entry.isIntersecting) continue;
+        const img = entry.target;
+        visible.unobserve(img);
+        if (forceLazyImages) {
+            if (img.dataset.src && !img.src.includes(img.dataset.src)) img.src = img.dataset.src;
+            if (img.loading === 'lazy') img.loading = 'eager';
+        }
+        if (!img.complete) {
+            loading.add(img);
+            const finished = () => { loading.delete(img); lastChange = performance.now(); };
+            img.addEventListener('load', finished, {once: true});
+            img.addEventListener('error', finished, {once: true});
+        }
+    }
+});
+const watched = new WeakSet();
+
+function finish(timedOut, count) {
+    mutations.disconnect();
+    visible.disconnect();
+    done({cards: count, loading: loading.size, elapsed_ms: performance.now() - start, timed_out: timedOut});
+}
+
+function tick() {
+    const now = performance.now();
+    const cards = document.querySelectorAll(cardSelector);
+    if (cards.length !== lastCount) {
+        lastCount = cards.length;
+        lastChange = now;
+    }
+    cards.forEach((card) => card.querySelectorAll('img').forEach((img) => {
+        if (!watched.has(img)) {
+            watched.add(img);
+            visible.observe(img);
+        }
+    }));
+
+    const root = document.documentElement;
+    const atBottom = window.innerHeight + window.scrollY >= root.scrollHeight - 50;
+    if (!atBottom && now - lastScroll >= stepMs) {
+        window.scrollBy(0, window.innerHeight * 0.8);
+        lastScroll = now;
+    }
+
+    if (atBottom && lastCount > 0 && loading.size === 0 && now - lastChange >= settleMs) {
+        finish(false, lastCount);
+    } else if (now - start >= deadlineMs) {
+        finish(true, lastCount);
+    } else {
+        setTimeout(tick, 50);
+    }
+}
+
+tick();
+"""
+
+# Time to ready of every page per site for the current run
+_ready_stats = {}
+_stats_lock = threading.Lock()
+
+def get_readiness_setting(name):
+    """Get a readiness setting from the environment, falling back to READINESS_CONFIG"""
+    default = READINESS_CONFIG[name]
+    try:
+        return type(default)(getenv(name, default))
+    except ValueError:
+        return default
+
+def reset_readiness_stats():
+    """Reset the page readiness stats for a new scraper run"""
+    with _stats_lock:
+        _ready_stats.clear()
+
+def get_readiness_stats():
+    """Get page count, time to ready and deadline hits per site for the current run"""
+    with _stats_lock:
+        return {
+            site: {
+                'pages': len(pages),
+                'avg_ready_seconds': round(sum(seconds for seconds, _ in pages) / len(pages), 2),
+                'max_ready_seconds': round(max(seconds for seconds, _ in pages), 2),
+                'timeouts': sum(1 for _, timed_out in pages if timed_out)
+            }
+            for site, pages in _ready_stats.items() if pages
+        }
+
+def wait_for_page_ready(driver, site_name, card_selector, force_lazy_images=False):
+    """Scroll through the page until its listing cards and their images stop changing
+
+    card_selector is a CSS selector matching one listing card. With force_lazy_images,
+    data-src/loading="lazy" images are switched to eager loading as they come into view.
+    Returns the seconds the page took to become ready.
+    """
+    deadline = get_readiness_setting('PAGE_READY_DEADLINE_SECONDS')
+    start_time = time.time()
+    timed_out = False
+    try:
+        driver.set_script_timeout(deadline + 5)
+        result = driver.execute_async_script(
+            _READY_SCRIPT,
+            card_selector,
+            get_readiness_setting('PAGE_READY_SETTLE_MS'),
+            get_readiness_setting('PAGE_READY_STEP_MS'),
+            deadline * 1000,
+            force_lazy_images
+        )
+        timed_out = bool(result and result.get('timed_out'))
+        if timed_out:
+            print(f"{site_name} page not settled after {deadline}s "
+                  f"({result.get('cards')} cards, {result.get('loading')} images loading), parsing anyway")
+    except Exception as e:
+        timed_out = True
+        print(f"Warning: Could not wait for {site_name} page readiness: {e}")
+
+    ready_seconds = time.time() - start_time
+    with _stats_lock:
+        _ready_stats.setdefault(site_name, []).append((ready_seconds, timed_out))
+    record_page_transfer(driver, site_name)
+    return ready_seconds
@@ -0,0 +1,17 @@
+def collect_pages(pages):
+    """Collect (page, listings) pairs into the old {page: listings} dict"""
+    all_data = {}
+    for page, listings in pages:
+        # Sites with several categories restart page numbers per category
+        all_data.setdefault(page, []).extend(listings)
+    return all_data
+
+def iter_scraper_pages(scraper, max_pages):
+    """Iterate a scraper module's pages, wrapping scrapers that only return a dict from scrape()"""
+    if hasattr(scraper, 'iter_pages'):
+        yield from scraper.iter_pages(max_pages=max_pages)
+        return
+
+    all_data = scraper.scrape(max_pages=max_pages) or {}
+    for page, listings in all_data.items():
+        yield page, listings
@@ -0,0 +1,233 @@
+from os import getenv
+import re
+
+# lxml and selectolax are optional, sites whose backend is missing use BeautifulSoup
+try:
+    from bs4 import BeautifulSoup, NavigableString, SoupStrainer
+except ImportError:
+    BeautifulSoup = None
+
+try:
+    import lxml.html
+    from lxml import etree
+    from cssselect import HTMLTranslator
+except ImportError:
+    etree = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# Backends that parse a page_source with a site spec's card fields (see site_spec.py):
+#   'soup'       - BeautifulSoup building only the card subtrees (SoupStrainer) and reading them with CSS selectors
+#   'lxml'       - lxml with every selector compiled once to XPath
+#   'selectolax' - selectolax (lexbor) CSS selectors
+# Override for all sites with PARSE_BACKEND, or for one site with PARSE_BACKEND_<SITE> (e.g. PARSE_BACKEND_DBA)
+PARSE_BACKENDS = ('soup', 'lxml', 'selectolax')
+DEFAULT_PARSE_BACKEND = 'lxml'
+SITE_PARSE_BACKENDS = {
+    'blocket': 'lxml',
+    'tori': 'lxml',
+    'dba': 'lxml',
+    'kleinanzeigen': 'lxml',
+    'marktplaats': 'lxml',
+    'ricardo': 'lxml',
+    'leboncoin': 'lxml',
+    'olx': 'lxml',
+    'gumtree': 'lxml',
+}
+
+# Backends already reported as not installed
+_missing_reported = set()
+
+def _backend_available(backend):
+    if backend == 'soup':
+        return BeautifulSoup is not None
+    if backend == 'lxml':
+        return etree is not None
+    if backend == 'selectolax':
+        return LexborHTMLParser is not None
+    return False
+
+def get_parse_backend(site_name):
+    """Get the parse backend for a site, falling back to 'soup' when its library is not installed"""
+    backend = (getenv(f'PARSE_BACKEND_{site_name.upper()}') or getenv('PARSE_BACKEND') or
+               SITE_PARSE_BACKENDS.get(site_name, DEFAULT_PARSE_BACKEND)).strip().lower()
+    if backend not in PARSE_BACKENDS:
+        backend = SITE_PARSE_BACKENDS.get(site_name, DEFAULT_PARSE_BACKEND)
+    if not _backend_available(backend):
+        if backend not in _missing_reported:
+            _missing_reported.add(backend)
+            print(f"Warning: Parse backend '{backend}' is not installed, using BeautifulSoup")
+        return 'soup'
+    return backend
+
+def _read_fields(card, spec, matches, read):
+    """Read a card's fields the way the in-browser extraction script does"""
+    item = {}
+    for name, rule in spec['fields'].items():
+        nodes = matches(card, rule)
+        if rule.get('exists'):
+            item[name] = len(nodes) > 0
+        elif rule.get('all'):
+            item[name] = [read(node, rule) for node in nodes]
+        elif nodes:
+            item[name] = read(nodes[-1] if rule.get('last') else nodes[0], rule)
+        else:
+            item[name] = None
+    return item
+
+def _filter_text(nodes, rule, text):
+    if 'equals' in rule:
+        nodes = [node for node in nodes if text(node) == rule['equals']]
+    if 'contains' in rule:
+        nodes = [node for node in nodes if rule['contains'] in text(node)]
+    return nodes
+
+# --- BeautifulSoup ---
+
+def _soup_text(node):
+    if isinstance(node, NavigableString):
+        return node.strip()
+    return node.get_text(strip=True)
+
+def _soup_matches(card, rule):
+    if not rule.get('selector') and 'contains' in rule:
+        return card.find_all(string=lambda text: type(text) is NavigableString and rule['contains'] in text)
+    nodes = card.select(rule['selector']) if rule.get('selector') else [card]
+    return _filter_text(nodes, rule, _soup_text)
+
+def _soup_read(node, rule):
+    if rule.get('attr') and not isinstance(node, NavigableString):
+        value = node.get(rule['attr'])
+        # Multi-valued attributes (class, rel) come back as lists
+        return ' '.join(value) if isinstance(value, list) else value
+    return _soup_text(node)
+
+def _parse_soup(page_source, spec):
+    # Only build the subtrees of the card's tag, the rest of the page is skipped while parsing
+    card_tag = re.match(r'[A-Za-z][\w-]*', spec['card'])
+    strainer = SoupStrainer(card_tag.group(0)) if card_tag else None
+    soup = BeautifulSoup(page_source, 'html.parser', parse_only=strainer)
+    return [_read_fields(card, spec, _soup_matches, _soup_read) for card in soup.select(spec['card'])]
+
+# --- lxml ---
+
+# Compiled XPath per (selector, prefix)
+_xpath_cache = {}
+
+if etree is not None:
+    _css_translator = HTMLTranslator()
+    # Text is read like BeautifulSoup's get_text(strip=True), which skips script and style contents
+    _text_xpath = etree.XPath('.//text()[not(ancestor::script or ancestor::style)]')
+
+def _compiled_xpath(selector, prefix):
+    key = (selector, prefix)
+    if key not in _xpath_cache:
+        if selector.startswith(':scope'):
+            # cssselect has no scoped queries, so anchor the chain on the card itself
+            selector = '*' + selector[len(':scope'):]
+            prefix = 'self::'
+        _xpath_cache[key] = etree.XPath(_css_translator.css_to_xpath(selector, prefix=prefix))
+    return _xpath_cache[key]
+
+def _lxml_text(node):
+    if isinstance(node, str):
+        return node.strip()
+    return ''.join(text.strip() for text in _text_xpath(node))
+
+def _lxml_matches(card, rule):
+    if not rule.get('selector') and 'contains' in rule:
+        return [text for text in _text_xpath(card) if rule['contains'] in text]
+    # Like querySelectorAll, only descendants of the card match
+    nodes = _compiled_xpath(rule['selector'], 'descendant::')(card) if rule.get('selector') else [card]
+    return _filter_text(nodes, rule, _lxml_text)
+
+def _lxml_read(node, rule):
+    if rule.get('attr') and not isinstance(node, str):
+        return node.get(rule['attr'])
+    return _lxml_text(node)
+
+def _parse_lxml(page_source, spec):
+    document = lxml.html.document_fromstring(page_source)
+    cards = _compiled_xpath(spec['card'], 'descendant-or-self::')(document)
+    return [_read_fields(card, spec, _lxml_matches, _lxml_read) for card in cards]
+
+# --- selectolax ---
+
+def _selectolax_scoped(card, selector):
+    """Match a ':scope > a > b' selector (child combinators only, lexbor has no :scope)"""
+    steps = [step.strip() for step in selector[len(':scope'):].split('>')][1:]
+    nodes = []
+    for node in card.css(' > '.join(steps)):
+        ancestor = node
+        for _ in steps:
+            ancestor = ancestor.parent
+        if ancestor is not None and ancestor.mem_id == card.mem_id:
+            nodes.append(node)
+    return nodes
+
+def _selectolax_text(node):
+    if node.tag == '-text':
+        return node.text(deep=False).strip()
+    return node.text(deep=True, separator='', strip=True)
+
+def _selectolax_matches(card, rule):
+    if not rule.get('selector') and 'contains' in rule:
+        return [node for node in card.traverse(include_text=True)
+                if node.tag == '-text' and rule['contains'] in node.text(deep=False)]
+    if not rule.get('selector'):
+        nodes = [card]
+    elif rule['selector'].startswith(':scope'):
+        nodes = _selectolax_scoped(card, rule['selector'])
+    else:
+        nodes = card.css(rule['selector'])
+    return _filter_text(nodes, rule, _selectolax_text)
+
+def _selectolax_read(node, rule):
+    if rule.get('attr') and node.tag != '-text':
+        return node.attributes.get(rule['attr'])
+    return _selectolax_text(node)
+
+def _parse_selectolax(page_source, spec):
+    tree = LexborHTMLParser(page_source)
+    # Match get_text(strip=True), which skips script and style contents
+    tree.strip_tags(['script', 'style'])
+    return [_read_fields(card, spec, _selectolax_matches, _selectolax_read) for card in tree.css(spec['card'])]
+
+_BACKEND_PARSERS = {
+    'soup': _parse_soup,
+    'lxml': _parse_lxml,
+    'selectolax': _parse_selectolax,
+}
+
+def parse_cards(backend, page_source, spec):
+    """Read the raw card fields of a page_source with a spec backend (None if it fails)"""
+    try:
+        return _BACKEND_PARSERS[backend](page_source, spec)
+    except Exception as e:
+        print(f"Warning: {backend} parse failed: {e}")
+        return None
+
+def build_listings(site_name, raw_cards, build_listing):
+    """Turn raw card fields into listings, skipping cards build_listing rejects or fails on"""
+    listings = []
+    for idx, raw in enumerate(raw_cards):
+        try:
+            listing = build_listing(raw)
+        except Exception as e:
+            print(f"Error processing {site_name} card {idx + 1}: {str(e)}")
+            continue
+        if listing:
+            listings.append(listing)
+    return listings
+
+def parse_listings(site_name, page_source, spec, build_listing, backend=None):
+    """Parse the listings of a page_source with the site's backend (or the given one)
+
+    Backends read the same raw fields as the in-browser extraction and go through the same
+    build_listing, so their listings match it.
+    """
+    raw_cards = parse_cards(backend or get_parse_backend(site_name), page_source, spec)
+    return build_listings(site_name, raw_cards or [], build_listing)
@@ -0,0 +1,199 @@
+from os import getenv
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from .extraction import record_source_parse
+from .parse_backend import build_listings, get_parse_backend, parse_cards
+from .site_spec import build_card_listing
+import atexit
+import multiprocessing
+import sys
+import threading
+import time
+
+# page_source parses run in worker processes while the browser loads the next page.
+# On Python 3.13+ the HTML is encoded into a shared memory segment instead of being pickled through
+# the task pipe, and the worker copies it out again to decode it. The segment belongs to the scraper
+# process, which unlinks it once the worker's result is back. Older Pythons can't attach a segment
+# without the worker's resource tracker claiming it, so there the HTML is sent with the task.
+# Workers return the raw card fields and listings are built here (site specs hold functions that
+# can't be sent to a process). Set PARSE_WORKERS=0 to parse in the scraper process.
+PARSE_WORKERS = 2
+# Attaching without tracking (SharedMemory(track=False)) came with Python 3.13
+SHARED_MEMORY_PAGES = sys.version_info >= (3, 13)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Pages, worker busy time and idle time of both sides per site for the current run
+_pipeline_stats = {}
+_stats_lock = threading.Lock()
+
+def get_parse_workers():
+    """Get the number of parser processes (0 when parsing in the scraper process)"""
+    try:
+        workers = int(getenv('PARSE_WORKERS', PARSE_WORKERS))
+    except ValueError:
+        workers = PARSE_WORKERS
+    # Pool workers of the concurrent scraper mode are daemons, which can't start processes
+    if multiprocessing.current_process().daemon:
+        return 0
+    return max(0, workers)
+
+def _get_executor(workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawn, like the scraper pool, so workers don't inherit browsers or Mongo clients
+            _executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+def shutdown_parse_workers():
+    """Stop the parser processes (called on shutdown)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+def _parse_in_worker(backend, memory_name, size, card_spec):
+    """Parse a page_source left in shared memory, returning its raw cards and the parse time"""
+    start_time = time.time()
+    # Not tracked here, the segment is the scraper process's to unlink
+    memory = shared_memory.SharedMemory(name=memory_name, track=False)
+    try:
+        page_source = bytes(memory.buf[:size]).decode('utf-8')
+    finally:
+        memory.close()
+    return parse_cards(backend, page_source, card_spec), time.time() - start_time
+
+def _parse_sent_in_worker(backend, page_source, card_spec):
+    """Parse a page_source sent with the task, returning its raw cards and the parse time"""
+    start_time = time.time()
+    return parse_cards(backend, page_source, card_spec), time.time() - start_time
+
+def _submit_shared(workers, backend, data, card_spec):
+    """Hand a page to a parser process through a shared memory segment"""
+    memory = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    memory.buf[:len(data)] = data
+    try:
+        future = _get_executor(workers).submit(_parse_in_worker, backend, memory.name, len(data), card_spec)
+    except Exception:
+        memory.close()
+        memory.unlink()
+        raise
+
+    # Only unlinked here, once the worker is done with it (or the parse was cancelled before it started)
+    def release(_):
+        memory.close()
+        memory.unlink()
+    future.add_done_callback(release)
+    return future
+
+def reset_pipeline_stats():
+    """Reset the parse pipeline stats for a new scraper run"""
+    with _stats_lock:
+        _pipeline_stats.clear()
+
+def get_pipeline_stats():
+    """Get offloaded pages and how long the fetch loop and the parsers each sat idle, per site"""
+    with _stats_lock:
+        stats = {}
+        for site, site_stats in _pipeline_stats.items():
+            pages = site_stats['pages']
+            stats[site] = {
+                'workers': site_stats['workers'],
+                'pages': pages,
+                'avg_kb': round(site_stats['bytes'] / pages / 1024, 1) if pages else None,
+                'parse_seconds': round(site_stats['parse_seconds'], 2),
+                # Time the fetch loop waited on parse results
+                'fetch_idle_seconds': round(site_stats['fetch_idle_seconds'], 2),
+                # Worker time without a page to parse while the site was crawled
+                'parse_idle_seconds': round(max(0.0, site_stats['workers'] * site_stats['seconds'] -
+                                                site_stats['parse_seconds']), 2),
+                # Parse time the fetch loop didn't have to wait for
+                'overlap_seconds': round(max(0.0, site_stats['parse_seconds'] -
+                                             site_stats['fetch_idle_seconds']), 2)
+            }
+        return stats
+
+class ParsePipeline:
+    """Hands a site's page_source parses to the parser processes and gives the listings back in page order"""
+
+    def __init__(self, site_name):
+        self.site_name = site_name
+        self.workers = get_parse_workers()
+        self.started = time.time()
+        self.pending = deque()
+        with _stats_lock:
+            self.stats = _pipeline_stats.setdefault(site_name, {
+                'workers': 0, 'pages': 0, 'bytes': 0, 'parse_seconds': 0.0,
+                'fetch_idle_seconds': 0.0, 'seconds': 0.0
+            })
+            self.stats['workers'] = max(self.stats['workers'], self.workers)
+
+    def submit(self, spec, page_source, category=None):
+        """Start parsing a page_source, returning the listings or a future of the raw cards"""
+        backend = get_parse_backend(self.site_name)
+        build_listing = lambda raw: build_card_listing(spec, raw, category)
+        if not self.workers:
+            start_time = time.time()
+            raw_cards = parse_cards(backend, page_source, spec)
+            record_source_parse(self.site_name, time.time() - start_time)
+            return build_listings(self.site_name, raw_cards or [], build_listing)
+
+        card_spec = {'card': spec['card'], 'fields': spec['fields']}
+        data = page_source.encode('utf-8')
+        if SHARED_MEMORY_PAGES:
+            future = _submit_shared(self.workers, backend, data, card_spec)
+        else:
+            future = _get_executor(self.workers).submit(_parse_sent_in_worker, backend, page_source, card_spec)
+        future.build_listing = build_listing
+        with _stats_lock:
+            self.stats['pages'] += 1
+            self.stats['bytes'] += len(data)
+        return future
+
+    def add(self, key, result):
+        """Queue a page's result (listings, or a future from submit) behind the earlier pages"""
+        self.pending.append((key, result))
+
+    def _result(self, result):
+        if isinstance(result, list):
+            return result
+        try:
+            raw_cards, seconds = result.result()
+        except Exception as e:
+            print(f"Warning: {self.site_name} parse worker failed: {e}")
+            return []
+        with _stats_lock:
+            self.stats['parse_seconds'] += seconds
+        record_source_parse(self.site_name, seconds)
+        return build_listings(self.site_name, raw_cards or [], result.build_listing)
+
+    def ready(self):
+        """Yield (key, listings) for the pages at the front whose parse is done"""
+        while self.pending and (isinstance(self.pending[0][1], list) or self.pending[0][1].done()):
+            key, result = self.pending.popleft()
+            yield key, self._result(result)
+
+    def finish(self):
+        """Wait for every queued page, yielding (key, listings) in order"""
+        while self.pending:
+            key, result = self.pending.popleft()
+            start_time = time.time()
+            listings = self._result(result)
+            with _stats_lock:
+                self.stats['fetch_idle_seconds'] += time.time() - start_time
+            yield key, listings
+
+    def close(self):
+        """Drop pages still queued and record the pipeline's running time"""
+        for _, result in self.pending:
+            if not isinstance(result, list):
+                result.cancel()
+        self.pending.clear()
+        with _stats_lock:
+            self.stats['seconds'] += time.time() - self.started
+
+atexit.register(shutdown_parse_workers)
@@ -0,0 +1,171 @@
+from os import getenv
+from .site_spec import build_card_listing
+import json
+import threading
+
+# Read listings from the page's own data (embedded JSON state or search XHR responses) before
+# falling back to scrolling and reading the rendered cards. Set PAYLOAD_CAPTURE=0 to always use the DOM.
+PAYLOAD_CAPTURE = True
+
+# A site spec's 'payload' entry says where the search results are and how they map to card fields:
+#   'global' - name of a window variable holding the state (an object or a JSON string)
+#   'script' - CSS selector of a <script> tag holding it as JSON
+#   'xhr'    - URL fragment of the search request whose response body holds it; needs the driver
+#              to be created with the 'goog:loggingPrefs' {'performance': 'ALL'} capability
+#   'items'  - dotted path to the list of results in that JSON
+#   'fields' - {card field: dotted path, or {'path', 'map': function applied to the value}};
+#              card fields without an entry are None
+_GLOBAL_SCRIPT = "return JSON.stringify(window[arguments[0]] === undefined ? null : window[arguments[0]]);"
+_SCRIPT_TAG_SCRIPT = "const el = document.querySelector(arguments[0]); return el ? el.textContent : null;"
+
+# Search responses seen in the performance log by tabs other than the one being read, per tab
+_other_tab_responses = {}
+
+# Captured pages, DOM pages and listing counts per site for the current run
+_capture_stats = {}
+_stats_lock = threading.Lock()
+
+def is_capture_enabled():
+    """Check whether payload capture is switched on"""
+    value = getenv('PAYLOAD_CAPTURE')
+    if value is None:
+        return PAYLOAD_CAPTURE
+    return value.strip().lower() not in ('0', 'false', 'no', 'off')
+
+def _site_stats(site_name):
+    return _capture_stats.setdefault(site_name, {
+        'payload_pages': 0, 'payload_listings': 0, 'dom_pages': 0, 'dom_listings': 0
+    })
+
+def reset_capture_stats():
+    """Reset the payload capture stats for a new scraper run"""
+    with _stats_lock:
+        _capture_stats.clear()
+
+def get_capture_stats():
+    """Get how often the payload path served a page instead of the DOM, per site, for the current run"""
+    with _stats_lock:
+        stats = {}
+        for site, site_stats in _capture_stats.items():
+            pages = site_stats['payload_pages'] + site_stats['dom_pages']
+            stats[site] = {
+                'payload_pages': site_stats['payload_pages'],
+                'dom_pages': site_stats['dom_pages'],
+                'payload_success_rate': round(site_stats['payload_pages'] / pages, 2) if pages else None,
+                'avg_payload_listings': (round(site_stats['payload_listings'] / site_stats['payload_pages'], 1)
+                                         if site_stats['payload_pages'] else None),
+                'avg_dom_listings': (round(site_stats['dom_listings'] / site_stats['dom_pages'], 1)
+                                     if site_stats['dom_pages'] else None)
+            }
+        return stats
+
+def record_dom_page(site_name, listing_count):
+    """Record a page of a payload-capable site that was read from the rendered cards"""
+    with _stats_lock:
+        site_stats = _site_stats(site_name)
+        site_stats['dom_pages'] += 1
+        site_stats['dom_listings'] += listing_count
+
+def json_path(data, path):
+    """Follow a dotted path (list indexes as numbers) into JSON, None where it breaks off"""
+    for key in path.split('.'):
+        if isinstance(data, list) and key.isdigit() and int(key) < len(data):
+            data = data[int(key)]
+        elif isinstance(data, dict) and key in data:
+            data = data[key]
+        else:
+            return None
+    return data
+
+def _loads(text):
+    data = json.loads(text) if text else None
+    # Some sites keep their state as a JSON string inside the JSON
+    return json.loads(data) if isinstance(data, str) else data
+
+def _xhr_payloads(driver, url_fragment):
+    """Read the bodies of the matching responses the current tab saw since the last call (newest first)"""
+    # The log holds every tab's events, responses of other tabs are kept until those tabs are read
+    handle = driver.current_window_handle
+    handles = driver.window_handles
+    request_ids = _other_tab_responses.pop(handle, [])
+    for entry in driver.get_log('performance'):
+        log = json.loads(entry['message'])
+        message = log['message']
+        if (message.get('method') == 'Network.responseReceived' and
+                url_fragment in message['params']['response']['url']):
+            tab = log.get('webview', handle)
+            # Entries whose tab id isn't a window handle can't be told apart, take them here
+            if tab == handle or tab not in handles:
+                request_ids.append(message['params']['requestId'])
+            else:
+                _other_tab_responses.setdefault(tab, []).append(message['params']['requestId'])
+
+    payloads = []
+    for request_id in reversed(request_ids):
+        try:
+            body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+            payloads.append(_loads(body['body']))
+        except Exception:
+            # Evicted or still loading, try the next one
+            continue
+    return payloads
+
+def read_payload(driver, payload_spec):
+    """Get the page's result list from its embedded state or search response (None if not found)"""
+    if payload_spec.get('global'):
+        candidates = [_loads(driver.execute_script(_GLOBAL_SCRIPT, payload_spec['global']))]
+    elif payload_spec.get('script'):
+        candidates = [_loads(driver.execute_script(_SCRIPT_TAG_SCRIPT, payload_spec['script']))]
+    else:
+        candidates = _xhr_payloads(driver, payload_spec['xhr'])
+
+    for data in candidates:
+        items = json_path(data, payload_spec['items']) if data is not None else None
+        if isinstance(items, list) and items:
+            return items
+    return None
+
+def map_item(spec, item):
+    """Map one result of the payload to the raw card fields the site spec builds listings from"""
+    raw = {name: None for name in spec['fields']}
+    for name, rule in spec['payload']['fields'].items():
+        path = rule['path'] if isinstance(rule, dict) else rule
+        value = json_path(item, path)
+        if isinstance(rule, dict) and rule.get('map') and value is not None:
+            value = rule['map'](value)
+        raw[name] = value
+    return raw
+
+def capture_listings(driver, spec, category=None):
+    """Build the page's listings straight from its data payload, or None to use the rendered cards"""
+    if not spec.get('payload') or not is_capture_enabled():
+        return None
+
+    site_name = spec['name']
+    try:
+        items = read_payload(driver, spec['payload'])
+    except Exception as e:
+        print(f"Warning: Could not read {site_name} payload: {e}")
+        items = None
+    if not items:
+        return None
+
+    listings = []
+    for idx, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        try:
+            listing = build_card_listing(spec, map_item(spec, item), category)
+        except Exception as e:
+            print(f"Error processing {site_name} payload item {idx + 1}: {str(e)}")
+            continue
+        if listing:
+            listings.append(listing)
+    if not listings:
+        return None
+
+    with _stats_lock:
+        site_stats = _site_stats(site_name)
+        site_stats['payload_pages'] += 1
+        site_stats['payload_listings'] += len(listings)
+    return listings
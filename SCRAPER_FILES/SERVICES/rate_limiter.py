@@ -0,0 +1,207 @@
+from os import getenv, makedirs, path
+from urllib.parse import urlsplit
+import asyncio
+import sqlite3
+import threading
+import time
+
+# Politeness limits per domain: requests per minute and how many may go out back to back.
+# Every page navigation (browser, tab or HTTP) takes a token from its domain's bucket first. The buckets
+# live in a SQLite file, so scrapers running in separate processes share them. Domains not listed use
+# the defaults, which match the old fixed 2s pause between pages.
+# Override with RATE_LIMIT_RPM / RATE_LIMIT_BURST, or per domain with RATE_LIMIT_RPM_<DOMAIN> /
+# RATE_LIMIT_BURST_<DOMAIN> (dots as underscores, e.g. RATE_LIMIT_RPM_BLOCKET_SE)
+DEFAULT_REQUESTS_PER_MINUTE = 30
+DEFAULT_BURST = 1
+DOMAIN_RATE_LIMITS = {
+    # Sites loaded in several tabs (see tab_pool.py) get a burst for their tabs
+    'blocket.se': (60, 3),
+    'tori.fi': (60, 3),
+    'kleinanzeigen.de': (60, 3),
+    'marktplaats.nl': (60, 3),
+    'translate.google.com': (60, 1),
+}
+RATE_LIMIT_PATH = path.join(path.dirname(path.dirname(path.abspath(__file__))), 'cache', 'rate_limits.sqlite3')
+
+_domain_limiter = None
+_limiter_lock = threading.Lock()
+
+# Requests and time spent waiting per domain for the current run
+_rate_limit_stats = {}
+_stats_lock = threading.Lock()
+
+class TokenBucket:
+    """Thread-safe token bucket: refills `rate` tokens per second and holds at most `burst`"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens=1):
+        """Take `tokens` if they are available, returning 0 or the seconds until they will be"""
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate if self.rate > 0 else 1.0
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available and take them, returning the seconds waited"""
+        waited = 0.0
+        while True:
+            delay = self.try_acquire(tokens)
+            if not delay:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+def domain_of(url):
+    """Get the domain a URL's requests are limited under (host without www. or port)"""
+    host = (urlsplit(url).hostname or url).lower()
+    return host[4:] if host.startswith('www.') else host
+
+def get_domain_limit(domain):
+    """Get a domain's (requests per minute, burst)"""
+    rate, burst = DOMAIN_RATE_LIMITS.get(domain, (DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_BURST))
+    suffix = domain.upper().replace('.', '_').replace('-', '_')
+    try:
+        rate = float(getenv(f'RATE_LIMIT_RPM_{suffix}') or getenv('RATE_LIMIT_RPM') or rate)
+        burst = float(getenv(f'RATE_LIMIT_BURST_{suffix}') or getenv('RATE_LIMIT_BURST') or burst)
+    except ValueError:
+        pass
+    return max(0.1, rate), max(1.0, burst)
+
+def get_domain_limiter():
+    """Get the process-wide per-domain rate limiter"""
+    global _domain_limiter
+    with _limiter_lock:
+        if _domain_limiter is None:
+            _domain_limiter = DomainRateLimiter()
+        return _domain_limiter
+
+def wait_for_domain(url):
+    """Block until a request to the URL's domain is allowed, returning the seconds waited"""
+    return get_domain_limiter().acquire(url)
+
+def reset_rate_limit_stats():
+    """Reset the rate limit stats for a new scraper run"""
+    with _stats_lock:
+        _rate_limit_stats.clear()
+
+def get_rate_limit_stats():
+    """Get each domain's limits, requests and time spent waiting for the current run"""
+    with _stats_lock:
+        stats = {}
+        for domain, domain_stats in _rate_limit_stats.items():
+            rate, burst = get_domain_limit(domain)
+            requests = domain_stats['requests']
+            stats[domain] = {
+                'requests_per_minute': rate,
+                'burst': burst,
+                'requests': requests,
+                'waited_seconds': round(domain_stats['waited_seconds'], 2),
+                'avg_wait_seconds': round(domain_stats['waited_seconds'] / requests, 2) if requests else None,
+                'max_wait_seconds': round(domain_stats['max_wait_seconds'], 2)
+            }
+        return stats
+
+class DomainRateLimiter:
+    """Token buckets per domain, kept in SQLite so every scraper process draws from the same ones"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or getenv('RATE_LIMIT_PATH', RATE_LIMIT_PATH)
+        self.lock = threading.Lock()
+        # Used when the shared file can't be reached
+        self.local_buckets = {}
+        self.shared = True
+        try:
+            makedirs(path.dirname(self.db_path), exist_ok=True)
+            # Transactions are opened by hand, to take the write lock before reading a bucket
+            self.conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS rate_buckets (
+                    domain TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Warning: Could not open shared rate limits, limiting in this process only: {e}")
+            self.shared = False
+
+    def _take_shared(self, domain, rate, burst):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(
+                "SELECT tokens, updated_at FROM rate_buckets WHERE domain = ?", (domain,)
+            ).fetchone()
+            now = time.time()
+            tokens = burst if row is None else min(burst, row[0] + max(0.0, now - row[1]) * rate)
+            delay = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not delay:
+                tokens -= 1
+            self.conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (domain, tokens, updated_at) VALUES (?, ?, ?)",
+                (domain, tokens, now)
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return delay
+
+    def _take(self, domain):
+        """Take a token from the domain's bucket, returning 0 or the seconds until one is available"""
+        rate_per_minute, burst = get_domain_limit(domain)
+        rate = rate_per_minute / 60
+        with self.lock:
+            if self.shared:
+                try:
+                    return self._take_shared(domain, rate, burst)
+                except sqlite3.Error as e:
+                    print(f"Warning: Could not use shared rate limits, limiting in this process only: {e}")
+                    self.shared = False
+            bucket = self.local_buckets.setdefault(domain, TokenBucket(rate, burst))
+        return bucket.try_acquire()
+
+    def _record(self, domain, waited):
+        with _stats_lock:
+            domain_stats = _rate_limit_stats.setdefault(domain, {
+                'requests': 0, 'waited_seconds': 0.0, 'max_wait_seconds': 0.0
+            })
+            domain_stats['requests'] += 1
+            domain_stats['waited_seconds'] += waited
+            domain_stats['max_wait_seconds'] = max(domain_stats['max_wait_seconds'], waited)
+
+    def acquire(self, url):
+        """Block until a request to the URL's domain is allowed, returning the seconds waited"""
+        domain = domain_of(url)
+        start_time = time.time()
+        delay = self._take(domain)
+        while delay:
+            time.sleep(delay)
+            delay = self._take(domain)
+        waited = time.time() - start_time
+        self._record(domain, waited)
+        return waited
+
+    async def acquire_async(self, url):
+        """Wait (without blocking the event loop) until a request to the URL's domain is allowed"""
+        domain = domain_of(url)
+        start_time = time.time()
+        # Taking a token may wait on the thread lock and the shared file's write lock
+        delay = await asyncio.to_thread(self._take, domain)
+        while delay:
+            await asyncio.sleep(delay)
+            delay = await asyncio.to_thread(self._take, domain)
+        waited = time.time() - start_time
+        self._record(domain, waited)
+        return waited
@@ -0,0 +1,120 @@
+from os import getenv
+import threading
+
+# Blocking is on unless RESOURCE_BLOCKING is set to 0/false (e.g. to compare bandwidth and load times)
+RESOURCE_BLOCKING = True
+
+# URL patterns (Network.setBlockedURLs wildcards) per resource group.
+# Listings only need the image URLs from the markup, never the image bytes.
+BLOCK_PATTERNS = {
+    'images': ['*.jpg*', '*.jpeg*', '*.png*', '*.gif*', '*.webp*', '*.avif*'],
+    'fonts': ['*.woff*', '*.woff2*', '*.ttf*', '*.otf*', '*fonts.googleapis.com*', '*fonts.gstatic.com*'],
+    'media': ['*.mp4*', '*.webm*', '*.m3u8*'],
+    'ad_tech': [
+        '*doubleclick.net*', '*googlesyndication.com*', '*googleadservices.com*', '*google-analytics.com*',
+        '*googletagmanager.com*', '*adnxs.com*', '*criteo.*', '*amazon-adsystem.com*', '*facebook.net*',
+        '*hotjar.com*', '*scorecardresearch.com*', '*taboola.com*', '*outbrain.com*', '*adform.net*',
+        '*rubiconproject.com*', '*pubmatic.com*', '*casalemedia.com*', '*smartadserver.com*'
+    ]
+}
+
+# Resource groups blocked per site, and patterns from those groups the site still needs.
+# Consent managers (Sourcepoint, OneTrust, Didomi) are never in the block lists.
+SITE_RESOURCE_POLICIES = {
+    'blocket': {'block': ['images', 'fonts', 'media', 'ad_tech'], 'allow': []},
+    'tori': {'block': ['images', 'fonts', 'media', 'ad_tech'], 'allow': []},
+    'dba': {'block': ['images', 'fonts', 'media', 'ad_tech'], 'allow': []},
+    'kleinanzeigen': {'block': ['images', 'fonts', 'media', 'ad_tech'], 'allow': []},
+    'marktplaats': {'block': ['images', 'fonts', 'media', 'ad_tech'], 'allow': []},
+    'ricardo': {'block': ['images', 'fonts', 'media', 'ad_tech'], 'allow': []},
+    'leboncoin': {'block': ['images', 'fonts', 'media', 'ad_tech'], 'allow': []},
+    # The OneTrust banner on these sites is loaded through Google Tag Manager
+    'olx': {'block': ['images', 'fonts', 'media', 'ad_tech'], 'allow': ['*googletagmanager.com*']},
+    'gumtree': {'block': ['images', 'fonts', 'media', 'ad_tech'], 'allow': ['*googletagmanager.com*']},
+}
+DEFAULT_RESOURCE_POLICY = {'block': ['fonts', 'media', 'ad_tech'], 'allow': []}
+
+# Lets the transfer measurement see every request of a listing page (the browser keeps 250 by default)
+_RESOURCE_BUFFER_SCRIPT = "performance.setResourceTimingBufferSize(5000);"
+
+_TRANSFER_SCRIPT = """
+const navigation = performance.getEntriesByType('navigation')[0];
+const resources = performance.getEntriesByType('resource');
+const size = (entry) => entry.transferSize || entry.encodedBodySize || 0;
+return {
+    bytes: (navigation ? size(navigation) : 0) + resources.reduce((total, entry) => total + size(entry), 0),
+    requests: resources.length + (navigation ? 1 : 0),
+    load_ms: navigation ? navigation.loadEventEnd - navigation.startTime : null
+};
+"""
+
+# Bytes and load time of every page per site for the current run
+_transfer_stats = {}
+_stats_lock = threading.Lock()
+
+def is_blocking_enabled():
+    """Check whether resource blocking is switched on"""
+    value = getenv('RESOURCE_BLOCKING')
+    if value is None:
+        return RESOURCE_BLOCKING
+    return value.strip().lower() not in ('0', 'false', 'no', 'off')
+
+def get_blocked_patterns(site_name):
+    """Build the list of blocked URL patterns for a site"""
+    policy = SITE_RESOURCE_POLICIES.get(site_name, DEFAULT_RESOURCE_POLICY)
+    return [
+        pattern
+        for group in policy['block']
+        for pattern in BLOCK_PATTERNS[group]
+        if pattern not in policy['allow']
+    ]
+
+def apply_resource_policy(site_name, driver):
+    """Block the site's unneeded resources on a new driver through the DevTools protocol"""
+    try:
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': _RESOURCE_BUFFER_SCRIPT})
+        if not is_blocking_enabled():
+            return
+        patterns = get_blocked_patterns(site_name)
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+        print(f"Blocking {len(patterns)} resource patterns for {site_name}")
+    except Exception as e:
+        print(f"Warning: Could not apply resource policy for {site_name}: {e}")
+
+def record_page_transfer(driver, site_name):
+    """Record the bytes downloaded and the load time of the current page"""
+    try:
+        transfer = driver.execute_script(_TRANSFER_SCRIPT)
+    except Exception as e:
+        print(f"Warning: Could not measure {site_name} page transfer: {e}")
+        return None
+
+    with _stats_lock:
+        _transfer_stats.setdefault(site_name, []).append(transfer)
+    return transfer
+
+def reset_transfer_stats():
+    """Reset the page transfer stats for a new scraper run"""
+    with _stats_lock:
+        _transfer_stats.clear()
+
+def get_transfer_stats():
+    """Get downloaded bytes and load time per site for the current run"""
+    blocking = is_blocking_enabled()
+    with _stats_lock:
+        stats = {}
+        for site, pages in _transfer_stats.items():
+            if not pages:
+                continue
+            load_times = [page['load_ms'] for page in pages if page.get('load_ms')]
+            total_bytes = sum(page.get('bytes') or 0 for page in pages)
+            stats[site] = {
+                'blocking': blocking,
+                'pages': len(pages),
+                'avg_page_kb': round(total_bytes / len(pages) / 1024, 1),
+                'total_mb': round(total_bytes / (1024 * 1024), 2),
+                'avg_requests': round(sum(page.get('requests') or 0 for page in pages) / len(pages), 1),
+                'avg_load_seconds': round(sum(load_times) / len(load_times) / 1000, 2) if load_times else None
+            }
+        return stats
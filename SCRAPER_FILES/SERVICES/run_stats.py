@@ -0,0 +1,81 @@
+from .browser_supervisor import get_browser_stats, reset_browser_stats
+from .crawl_engine import get_crawl_stats, reset_crawl_stats
+from .crawl_state import get_incremental_stats, reset_incremental_stats
+from .driver_service import get_driver_stats, reset_driver_stats
+from .extraction import get_extraction_stats, reset_extraction_stats
+from .http_fetch import get_fetch_stats, reset_fetch_stats
+from .mongo_service import get_connection_stats, reset_connection_stats
+from .page_readiness import get_readiness_stats, reset_readiness_stats
+from .parse_pool import get_pipeline_stats, reset_pipeline_stats
+from .payload_capture import get_capture_stats, reset_capture_stats
+from .rate_limiter import get_rate_limit_stats, reset_rate_limit_stats
+from .resource_policy import get_transfer_stats, reset_transfer_stats
+from .tab_pool import get_tab_stats, reset_tab_stats
+from .translation_cache import get_cache_stats, reset_cache_stats
+from .translation_executor import get_translation_stats, reset_translation_stats
+from .watchdog import get_watchdog_events, reset_watchdog_events
+
+# The services' stats in the run log: log entry key, getter, reset and how the stats are kept
+# ('site' for {site: stats}, 'events' for [{'site': ...}], 'process' for the process as a whole).
+# A site's scraper stats are collected when it ends (in its pool worker, or in the runner thread that
+# scrapes in this process) and sent on with its 'done' message.
+RUN_STATS = (
+    ('mongo_connections', get_connection_stats, reset_connection_stats, 'process'),
+    ('driver_startups', get_driver_stats, reset_driver_stats, 'events'),
+    ('translation_cache', get_cache_stats, reset_cache_stats, 'site'),
+    ('translation_chunks', get_translation_stats, reset_translation_stats, 'site'),
+    ('page_readiness', get_readiness_stats, reset_readiness_stats, 'site'),
+    ('page_transfer', get_transfer_stats, reset_transfer_stats, 'site'),
+    ('extraction', get_extraction_stats, reset_extraction_stats, 'site'),
+    ('payload_capture', get_capture_stats, reset_capture_stats, 'site'),
+    ('page_fetch', get_fetch_stats, reset_fetch_stats, 'site'),
+    ('crawl_engine', get_crawl_stats, reset_crawl_stats, 'process'),
+    ('tab_pool', get_tab_stats, reset_tab_stats, 'site'),
+    ('parse_pipeline', get_pipeline_stats, reset_pipeline_stats, 'site'),
+    ('incremental_crawl', get_incremental_stats, reset_incremental_stats, 'site'),
+    ('rate_limits', get_rate_limit_stats, reset_rate_limit_stats, 'process'),
+    ('browsers', get_browser_stats, reset_browser_stats, 'process'),
+    ('timeouts', get_watchdog_events, reset_watchdog_events, 'events'),
+)
+
+# Stats only the scheduling process keeps (translation and uploads run there), the others come with each scraper
+PARENT_STATS = ('mongo_connections', 'translation_cache', 'translation_chunks')
+SCRAPER_STATS = tuple(key for key, _, _, _ in RUN_STATS if key not in PARENT_STATS)
+
+def reset_run_stats(kept=None, keys=None):
+    """Reset the services' stats for a new scraper run (only those kept one way, e.g. 'process', or of keys)"""
+    for key, _, reset, stats_kept in RUN_STATS:
+        if (kept is None or stats_kept == kept) and (keys is None or key in keys):
+            reset()
+
+def collect_run_stats(keys=None):
+    """Get the services' stats (all of them, or those of keys) by log entry key"""
+    return {key: get_stats() for key, get_stats, _, _ in RUN_STATS if keys is None or key in keys}
+
+def merge_run_stats(stats, other):
+    """Add stats collected in another process: dicts are merged, lists joined and counts added"""
+    merged = dict(stats)
+    for key, value in other.items():
+        current = merged.get(key)
+        if isinstance(current, dict) and isinstance(value, dict):
+            merged[key] = merge_run_stats(current, value)
+        elif isinstance(current, list) and isinstance(value, list):
+            merged[key] = current + value
+        elif (isinstance(current, (int, float)) and isinstance(value, (int, float))
+              and not isinstance(current, bool) and not isinstance(value, bool)):
+            merged[key] = current + value
+        elif value is not None or key not in merged:
+            merged[key] = value
+    return merged
+
+def site_run_stats(stats, site_name):
+    """Keep one site's part of collected stats"""
+    kept = {key: stats_kept for key, _, _, stats_kept in RUN_STATS}
+    site_stats = {}
+    for key, value in stats.items():
+        if kept.get(key) == 'site':
+            value = {site: site_value for site, site_value in value.items() if site == site_name}
+        elif kept.get(key) == 'events':
+            value = [event for event in value if event.get('site') == site_name]
+        site_stats[key] = value
+    return site_stats
@@ -2,12 +2,30 @@ import os
 import importlib.util
 import sys
 from .translation_service import TranslationService
-from .upload_service import upload_data_to_mongo
+from .translation_cache import reset_cache_stats
+from .translation_executor import reset_translation_stats
+from .upload_service import get_last_run_stats, reset_stats, upload_data_to_mongo
 from .database_service import DatabaseService
 from .cleanup_service import CleanupService
-import subprocess
+from .mongo_service import get_database
+from .browser_supervisor import kill_child_browsers, reap_orphan_browsers
+from .driver_service import quit_all_drivers
+from .crawl_engine import prefetch_pages
+from .http_fetch import load_prefetched, pop_site_prefetched
+from .page_budget import (get_budget_decisions, get_category_budgets, plan_page_budgets,
+                          reset_budget_decisions, set_category_budgets)
+from .page_stream import iter_scraper_pages
+from .site_pages import planned_pages
+from .run_stats import SCRAPER_STATS, collect_run_stats, merge_run_stats, reset_run_stats, site_run_stats
+from .watchdog import get_watchdog_events, record_timeout, reset_watchdog_events, watch_pages
+import itertools
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+import traceback
 from datetime import datetime
-from pymongo import MongoClient
 from dotenv import load_dotenv
 
 # Define num pages per batch
@@ -22,123 +40,546 @@ SCRAPER_CONFIG = {
     'dba': 1
 }
 
+# Number of site scrapers run at once in separate processes. 1 runs them one after another in this
+# process, which keeps each site's browser across runs and lets pages be parsed in parser processes
+# (see parse_pool.py). Pool workers are daemons, so they parse in-process.
+SCRAPER_CONCURRENCY = 1
+# Seconds a site scraper may run, and may take for one page, before its browser is killed and it stops
+# with the pages it already sent (see watchdog.py). Pool workers watch their own scraper.
+SCRAPER_SITE_TIMEOUT = 900
+SCRAPER_PAGE_TIMEOUT = 240
+# Seconds each planned page adds to a site's timeout, so runs planning more pages than
+# SCRAPER_SITE_TIMEOUT allows (like the first run's backfill) get the time they need
+SCRAPER_SECONDS_PER_PAGE = 20
+# Seconds past those a pool worker gets to stop by itself. After that the parent kills the worker's
+# browsers, and restarts the pool if the worker is still stuck after another grace period.
+SCRAPER_STOP_GRACE = 60
+# Seconds between removals of old listings while sites are scheduled one by one
+CLEANUP_INTERVAL = 3600
+
+def get_int_setting(name, default):
+    """Get an integer setting from the environment"""
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+def get_site_timeout(scraper, batch_size, site_timeout):
+    """Get the seconds a scraper may run: site_timeout, or more when it plans more pages than that allows
+
+    A site's category budgets must be set first, as its crawl goes by them (see page_budget.py).
+    """
+    spec = getattr(scraper, 'SITE_SPEC', None)
+    # Each category's planned pages, stretched while its pages are still new (see crawl_state.py)
+    pages = planned_pages(spec, batch_size) if spec else batch_size
+    return max(site_timeout, pages * get_int_setting('SCRAPER_SECONDS_PER_PAGE', SCRAPER_SECONDS_PER_PAGE))
+
+def load_scraper_module(file_path):
+    """Dynamically load a Python module from file path"""
+    module_name = os.path.splitext(os.path.basename(file_path))[0]
+    spec = importlib.util.spec_from_file_location(module_name, file_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+# Queue used by pool workers to report when (and in which process) a site starts, its pages and when it ends
+_worker_status_queue = None
+
+# The worker pool of the concurrent mode lives across runs, with the queue its workers report through
+_scraper_pool = None
+_scraper_pool_queue = None
+# Tags the messages of each queued site, so pages a killed worker left in the queue aren't taken for a later run's
+_task_ids = itertools.count(1)
+
+def get_scraper_pool(workers):
+    """Get the long-lived scraper pool and its status queue, starting them on first use"""
+    global _scraper_pool, _scraper_pool_queue
+    if _scraper_pool is None:
+        # Spawn fresh interpreters so workers don't inherit the Mongo client or translation thread
+        context = multiprocessing.get_context('spawn')
+        _scraper_pool_queue = context.Queue()
+        # One task per worker process, so every site gets a fresh process and browser
+        _scraper_pool = context.Pool(workers, initializer=_init_worker, initargs=(_scraper_pool_queue,),
+                                     maxtasksperchild=1)
+    return _scraper_pool, _scraper_pool_queue
+
+def shutdown_scraper_pool():
+    """Stop the scraper pool's worker processes (called on shutdown)"""
+    global _scraper_pool, _scraper_pool_queue
+    if _scraper_pool is not None:
+        _scraper_pool.terminate()
+        _scraper_pool.join()
+        _scraper_pool = None
+        _scraper_pool_queue = None
+
+def _init_worker(status_queue):
+    """Set up a scraper pool worker process"""
+    global _worker_status_queue
+    _worker_status_queue = status_queue
+    # Let the parent handle Ctrl+C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _scrape_in_worker(scraper_path, site_name, batch_size, task_id, prefetched=None, category_budgets=None,
+                      prefetch=False, page_timeout=SCRAPER_PAGE_TIMEOUT, site_timeout=SCRAPER_SITE_TIMEOUT):
+    """Run one site scraper in a pool worker process, sending each page to the parent as it is parsed
+
+    With prefetch the worker fetches the site's server-rendered pages ahead itself (see crawl_engine.py).
+    A scraper past its timeouts loses its browser and the worker ends with the pages already sent.
+    """
+    _worker_status_queue.put(('started', task_id, os.getpid(), time.time()))
+    error = None
+    # This process's stats are the site's, sent to the parent with 'done'
+    reset_run_stats()
+    try:
+        # Page budgets the parent planned for the site's categories
+        if category_budgets:
+            set_category_budgets(site_name, category_budgets)
+        # Pages the parent's crawl engine fetched ahead
+        if prefetched:
+            load_prefetched(site_name, prefetched)
+        scraper = load_scraper_module(scraper_path)
+        spec = getattr(scraper, 'SITE_SPEC', None)
+        if prefetch and spec:
+            try:
+                prefetch_pages([(spec, batch_size)])
+            except Exception as e:
+                # The scraper fetches its pages itself
+                print(f"Warning: Could not prefetch {site_name} pages: {e}")
+        # The parent's deadlines start with the scraper, like the watchdog's
+        site_timeout = get_site_timeout(scraper, batch_size, site_timeout)
+        _worker_status_queue.put(('scraping', task_id, time.time(), site_timeout))
+        pages = watch_pages(site_name, iter_scraper_pages(scraper, batch_size), page_timeout, site_timeout,
+                            mode='worker')
+        for page, listings in pages:
+            _worker_status_queue.put(('page', task_id, page, listings))
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        # Sent after the pages, so the parent has handled all of them when this arrives
+        _worker_status_queue.put(('done', task_id, error, collect_run_stats()))
+        # Workers exit without running atexit hooks, so close this process's browser here,
+        # with whatever its earlier browsers left behind
+        quit_all_drivers()
+        reap_orphan_browsers()
+
 class ScraperService:
     def __init__(self):
+        load_dotenv()
         self.translation_service = TranslationService()
         self.cleanup_service = CleanupService()
+        self.database_service = DatabaseService()
         self.scraper_results = {}
+        self.current_config = None
+        self.last_cleanup = None
+        # Sites queued in the scraper pool or the runner thread, by site and by the task id their messages carry
+        self.running = {}
+        self.task_sites = {}
+        # With SCRAPER_CONCURRENCY at 1 dispatched sites are scraped by a thread of this process, which
+        # reports through a queue like pool workers do
+        self.runner = None
+        self.runner_jobs = queue.Queue()
+        self.runner_queue = queue.Queue()
+        # Stats the workers collected for their sites (see run_stats.py)
+        self.worker_stats = {}
+        # Results of dispatched sites, put here once their last batch is uploaded
+        self.completed = queue.Queue()
+        self.concurrency = max(1, get_int_setting('SCRAPER_CONCURRENCY', SCRAPER_CONCURRENCY))
+        self.site_timeout = get_int_setting('SCRAPER_SITE_TIMEOUT', SCRAPER_SITE_TIMEOUT)
+        self.page_timeout = get_int_setting('SCRAPER_PAGE_TIMEOUT', SCRAPER_PAGE_TIMEOUT)
+        self.stop_grace = get_int_setting('SCRAPER_STOP_GRACE', SCRAPER_STOP_GRACE)
 
     def check_collection_exists(self):
         """Check if the fleatronics collection exists and has documents"""
-        load_dotenv()
-        mongo_uri = os.getenv('MONGODB_URI')
-        if not mongo_uri:
-            raise ValueError("MONGODB_URI environment variable not set")
-            
-        client = MongoClient(mongo_uri)
-        db = client['fleatronics']
-        
-        try:
-            collection_exists = 'listings' in db.list_collection_names()
-            has_documents = db.listings.count_documents({}) > 0 if collection_exists else False
-            return collection_exists and has_documents
-        finally:
-            client.close()
+        db = get_database()
+        collection_exists = 'listings' in db.list_collection_names()
+        has_documents = db.listings.count_documents({}) > 0 if collection_exists else False
+        return collection_exists and has_documents
 
-    def get_adjusted_config(self):
-        """Get scraper config with adjusted batch sizes if needed"""
+    def get_adjusted_config(self, sites=None):
+        """Get this run's pages per site: the page budget planned from past runs (see page_budget.py)
+
+        sites limits the run (and the planned budgets) to some of the sites.
+        """
+        if self.current_config is not None:
+            return self.current_config
+
+        default_config = {site: pages for site, pages in SCRAPER_CONFIG.items() if sites is None or site in sites}
+        self.current_config = self.plan_config(default_config)
+        return self.current_config
+
+    def plan_config(self, default_config):
+        """Plan the pages of default_config's sites: 20 times the default on the first run, else the page budget"""
         is_first_run = not self.check_collection_exists()
         
         if is_first_run:
             print("\nFirst run detected - increasing batch sizes for initial data collection")
-            return {site: pages * 20 for site, pages in SCRAPER_CONFIG.items()}
-        
-        return SCRAPER_CONFIG
+            reset_budget_decisions(default_config)
+            return {site: pages * 20 for site, pages in default_config.items()}
+        return plan_page_budgets(default_config)
+
+    def get_scraper_files(self, current_config):
+        """Get the scraper files of the sites in current_config"""
+        scrapers_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'SCRAPERS')
+        return [
+            os.path.join(scrapers_dir, f) 
+            for f in os.listdir(scrapers_dir)
+            if f.endswith('.py') 
+            and 'scraper' in f.lower() 
+            and 'leboncoin' not in f.lower()
+            and f != '__init__.py'
+            and os.path.splitext(f)[0].replace('_scraper', '') in current_config
+        ]
+
+    def cleanup_if_due(self):
+        """Remove old listings, at most once every CLEANUP_INTERVAL seconds"""
+        interval = get_int_setting('CLEANUP_INTERVAL', CLEANUP_INTERVAL)
+        if self.last_cleanup is not None and time.time() - self.last_cleanup < interval:
+            return
+        cleanup_stats = self.cleanup_service.cleanup_old_listings()
+        print(f"\nCleanup completed: {cleanup_stats['listings_deleted']} old listings removed")
+        self.last_cleanup = time.time()
 
     def load_scraper(self, file_path):
         """Dynamically load a Python module from file path"""
-        module_name = os.path.splitext(os.path.basename(file_path))[0]
-        spec = importlib.util.spec_from_file_location(module_name, file_path)
-        module = importlib.util.module_from_spec(spec)
-        sys.modules[module_name] = module
-        spec.loader.exec_module(module)
-        return module
+        return load_scraper_module(file_path)
+
+    def prefetch_http_pages(self, scraper_files, current_config):
+        """Fetch the pages of HTTP-capable sites ahead of their scrapers, all sites at once (see crawl_engine.py)"""
+        jobs = []
+        for scraper_path in scraper_files:
+            site_name = os.path.basename(scraper_path).replace('_scraper.py', '')
+            try:
+                spec = getattr(self.load_scraper(scraper_path), 'SITE_SPEC', None)
+            except Exception as e:
+                print(f"Warning: Could not load {site_name} scraper for prefetching: {e}")
+                continue
+            if spec:
+                jobs.append((spec, current_config.get(site_name, 2)))
+
+        try:
+            prefetch_pages(jobs)
+        except Exception as e:
+            # The scrapers fetch their pages themselves
+            print(f"Warning: Could not prefetch pages: {e}")
 
     def run_single_scraper(self, scraper_path):
-        """Run a single scraper"""
+        """Run a single scraper, handing each page to the pipeline as soon as it is parsed"""
         stats = ScraperStats()
+        site_name = os.path.basename(scraper_path).replace('_scraper.py', '')
         try:
-            site_name = os.path.basename(scraper_path).replace('_scraper.py', '')
-            
             current_config = self.get_adjusted_config()
             batch_size = current_config.get(site_name, 2)
             
             print(f"\n=== Starting {site_name} scraper with batch_size={batch_size} ===")
             
             scraper = self.load_scraper(scraper_path)
-            all_data = scraper.scrape(max_pages=batch_size)
-            
-            stats.data = all_data
+            # A stuck scraper loses its browser and the run moves on with the pages it already sent
+            pages = watch_pages(site_name, iter_scraper_pages(scraper, batch_size), self.page_timeout,
+                                get_site_timeout(scraper, batch_size, self.site_timeout))
+            for page, listings in pages:
+                self.process_page(site_name, page, listings, stats)
+
+            self.finish_site(site_name, stats)
+            return stats
             
-            if not all_data:
-                print(f"Warning: No data returned from {site_name} scraper")
-                return stats
-                
-            stats.total_ads, stats.complete_ads = calculate_completeness(all_data)
+        except Exception as e:
+            # Pages handled before the error are already queued or uploaded
+            print(f"Error in {site_name} scraper: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return stats
+
+    def process_page(self, site_name, page, listings, stats):
+        """Feed one scraped page into the stats and the translation/upload pipeline"""
+        try:
+            stats.pages += 1
+            stats.add_listings(listings)
+            if not listings:
+                return
+
+            # Only listings that aren't stored yet go on to translation and upload
+            new_data, known_stats = self.filter_new_listings(site_name, {page: listings})
             
             if 'gumtree' in site_name.lower():
-                stats.total_ads, stats.new_ads, stats.complete_ads, stats.category_stats = upload_data_to_mongo(site_name, all_data)
+                _, new_ads, _, _ = upload_data_to_mongo(site_name, new_data, known_stats)
+                stats.new_ads += new_ads
             else:
-                self.translation_service.add_to_queue(site_name, all_data)
-                stats.total_ads = sum(len(page) for page in all_data.values())
-                stats.complete_ads = sum(1 for page in all_data.values() 
-                                        for item in page 
-                                        if item.get('link') and 
-                                           item.get('main_image') and 
-                                           item.get('title', {}).get('original'))
-                
-                for page in all_data.values():
-                    for item in page:
-                        category = item.get('category', 'uncategorized')
-                        if category not in stats.category_stats:
-                            stats.category_stats[category] = {'total': 0, 'new': 0, 'complete': 0}
-                        stats.category_stats[category]['total'] += 1
-                        if (item.get('link') and 
-                            item.get('main_image') and 
-                            item.get('title', {}).get('original')):
-                            stats.category_stats[category]['complete'] += 1
-
-            print(f"=== Completed scraping for {site_name} ===\n")
-            return stats
+                self.translation_service.add_to_queue(site_name, new_data, known_stats)
             
         except Exception as e:
-            print(f"Error in {site_name} scraper: {str(e)}")
+            print(f"Error processing {site_name} page {page}: {str(e)}")
             import traceback
             traceback.print_exc()
-            return stats
 
-    def run_all_scrapers(self):
-        """Run all scrapers sequentially"""
+    def finish_site(self, site_name, stats):
+        """Report the end of one site's scrape"""
+        if not stats.total_ads:
+            print(f"Warning: No data returned from {site_name} scraper")
+        print(f"=== Completed scraping for {site_name}: {stats.pages} pages, {stats.total_ads} ads ===\n")
+
+    def filter_new_listings(self, site_name, all_data):
+        """Dedup stage: drop listings already in the database before translation and upload"""
+        try:
+            new_data, known_stats = self.database_service.filter_new_listings(site_name, all_data)
+        except Exception as e:
+            # Forward everything if the lookup fails, the upload still skips stored listings
+            print(f"Warning: Could not check {site_name} listings against the database: {e}")
+            return all_data, {}
+
+        known = sum(stats['total'] for stats in known_stats.values())
+        print(f"{site_name}: {known} listings already stored, forwarding "
+              f"{sum(len(page) for page in new_data.values())} new listings")
+        return new_data, known_stats
+
+    def start(self):
+        """Start the translation service for sites dispatched one by one (see dispatch)"""
+        self.translation_service.start()
+
+    def stop(self):
+        """Wait for the queued translations and uploads to finish and release the services"""
+        self.runner_jobs.put(None)
+        self.translation_service.stop()
+        self.cleanup_service.close()
+
+    def dispatch(self, sites):
+        """Start the scrapers of sites and return at once, returning the sites that couldn't be started
+
+        With SCRAPER_CONCURRENCY at 1 they are scraped one after another by a thread of this process,
+        which keeps their browsers across runs and fetches their server-rendered pages ahead together.
+        Otherwise each site goes to the scraper pool. poll() handles their pages, completed_sites()
+        gives each site's result once its last batch is uploaded.
+        """
+        self.cleanup_if_due()
+        jobs = []
+        failed = []
+        for site_name in sites:
+            try:
+                batch_size = self.plan_config({site_name: SCRAPER_CONFIG[site_name]})[site_name]
+                scraper_path = self.get_scraper_files({site_name: batch_size})[0]
+            except Exception as e:
+                print(f"Error starting {site_name} scraper: {e}")
+                failed.append(site_name)
+                continue
+            # Only this site's counts start over, other sites may still be uploading theirs
+            reset_stats(site_name)
+            reset_cache_stats(site_name)
+            reset_translation_stats(site_name)
+            reset_watchdog_events(site_name)
+            print(f"\n=== Queued {site_name} scraper with batch_size={batch_size} ===")
+            if self.concurrency > 1:
+                self.start_task(site_name, scraper_path, batch_size, prefetch=True, report=True,
+                                page_budget=get_budget_decisions(site_name))
+            else:
+                task_id = self.add_run(site_name, report=True, page_budget=get_budget_decisions(site_name),
+                                       local=True)
+                jobs.append((task_id, site_name, scraper_path, batch_size, get_category_budgets(site_name)))
+
+        if jobs:
+            if self.runner is None:
+                self.runner = threading.Thread(target=self.run_local_jobs, name='scraper-runner', daemon=True)
+                self.runner.start()
+            self.runner_jobs.put(jobs)
+        return failed
+
+    def add_run(self, site_name, report=False, page_budget=None, local=False):
+        """Start tracking a queued site, returning the task id its messages carry"""
+        task_id = next(_task_ids)
+        run = {'task_id': task_id, 'stats': ScraperStats(), 'pid': None, 'started': None, 'last_seen': None,
+               'site_timeout': self.site_timeout, 'browsers_killed': None, 'report': report,
+               'page_budget': page_budget, 'local': local}
+        self.running[site_name] = run
+        self.task_sites[task_id] = site_name
+        self.scraper_results[site_name] = run['stats']
+        return task_id
+
+    def start_task(self, site_name, scraper_path, batch_size, prefetched=None, prefetch=False, report=False,
+                   page_budget=None):
+        """Queue a site's scraper in the pool without waiting for it (its messages are handled by poll)"""
+        pool, status_queue = get_scraper_pool(self.concurrency)
+        task_id = self.add_run(site_name, report, page_budget)
+        # A task that fails before its worker could report (e.g. arguments that can't be sent) ends the site too,
+        # a second 'done' from a worker that did report is ignored
+        pool.apply_async(
+            _scrape_in_worker,
+            (scraper_path, site_name, batch_size, task_id, prefetched, get_category_budgets(site_name), prefetch,
+             self.page_timeout, self.site_timeout),
+            error_callback=lambda e: status_queue.put(('done', task_id, str(e), None)))
+
+    def run_local_jobs(self):
+        """Scrape the dispatched batches of sites one after another (runs in the runner thread)"""
+        while True:
+            jobs = self.runner_jobs.get()
+            if jobs is None:
+                return
+            # The stats of sites scraped before went out with their 'done'
+            reset_run_stats(keys=SCRAPER_STATS)
+            for task_id, site_name, _, _, category_budgets in jobs:
+                set_category_budgets(site_name, category_budgets)
+            # Server-rendered pages of all the batch's sites are fetched at once, before the browsers start
+            self.prefetch_http_pages([job[2] for job in jobs], {job[1]: job[3] for job in jobs})
+            for task_id, site_name, scraper_path, batch_size, _ in jobs:
+                self.scrape_locally(task_id, site_name, scraper_path, batch_size)
+
+    def scrape_locally(self, task_id, site_name, scraper_path, batch_size):
+        """Run one site's scraper in this process, reporting to poll() like a pool worker does"""
+        self.runner_queue.put(('started', task_id, os.getpid()))
+        error = None
+        try:
+            scraper = self.load_scraper(scraper_path)
+            site_timeout = get_site_timeout(scraper, batch_size, self.site_timeout)
+            self.runner_queue.put(('scraping', task_id, time.time(), site_timeout))
+            # A stuck scraper loses its browser and the runner moves on with the pages it already sent
+            pages = watch_pages(site_name, iter_scraper_pages(scraper, batch_size), self.page_timeout, site_timeout)
+            for page, listings in pages:
+                self.runner_queue.put(('page', task_id, page, listings))
+        except Exception as e:
+            error = str(e)
+            traceback.print_exc()
+        finally:
+            # The scraper stats gathered since the last site's are this site's
+            stats = site_run_stats(collect_run_stats(SCRAPER_STATS), site_name)
+            reset_run_stats('process', SCRAPER_STATS)
+            self.runner_queue.put(('done', task_id, error, stats))
+
+    def poll(self, timeout=1):
+        """Handle the scrapers' messages for up to timeout seconds, then stop sites past their deadlines"""
+        status_queue = self.runner_queue if self.concurrency == 1 else _scraper_pool_queue
+        if status_queue is None:
+            time.sleep(timeout)
+            return
+        # Handle worker messages: site started, page parsed, site done
+        try:
+            message = status_queue.get(timeout=timeout)
+            while True:
+                self.handle_message(message)
+                message = status_queue.get_nowait()
+        except queue.Empty:
+            pass
+        self.check_deadlines()
+
+    def handle_message(self, message):
+        """Handle one message from a pool worker or the runner thread"""
+        kind, task_id = message[0], message[1]
+        site_name = self.task_sites.get(task_id)
+        # Left over from a site that already ended or was killed
+        if site_name is None:
+            return
+        run = self.running[site_name]
+        if kind == 'started':
+            run['pid'] = message[2]
+        elif kind == 'scraping':
+            run['started'], run['site_timeout'] = message[2], message[3]
+            run['last_seen'] = time.time()
+        elif kind == 'page':
+            self.process_page(site_name, message[2], message[3], run['stats'])
+            run['last_seen'] = time.time()
+        elif kind == 'done':
+            if message[2]:
+                print(f"Error in {site_name} scraper: {message[2]}")
+            self.end_task(site_name, error=message[2], worker_stats=message[3])
+
+    def check_deadlines(self):
+        """Step in for workers that didn't stop their scraper by themselves past its deadlines
+
+        The worker's browsers are killed first, which fails the stuck WebDriver call. A worker still
+        stuck a grace period later is only freed by restarting the pool, which ends every running site.
+        """
+        now = time.time()
+        stuck = {}
+        for site_name, run in list(self.running.items()):
+            # The runner thread's watchdog always hands back control
+            if run['started'] is None or run['local']:
+                continue
+            if now - run['started'] > run['site_timeout'] + self.stop_grace:
+                kind, limit = 'site_timeout', run['site_timeout']
+            elif now - run['last_seen'] > self.page_timeout + self.stop_grace:
+                kind, limit = 'page_timeout', self.page_timeout
+            else:
+                continue
+            if run['browsers_killed'] is None:
+                killed = kill_child_browsers(run['pid'])
+                record_timeout(site_name, kind, limit, run['stats'].pages,
+                               f"{killed} browser processes of worker {run['pid']} killed", 'concurrent')
+                run['browsers_killed'] = now
+            elif now - run['browsers_killed'] > self.stop_grace:
+                stuck[site_name] = (kind, limit)
+
+        if stuck:
+            print(f"Restarting the scraper pool, {', '.join(stuck)} still stuck")
+            # Messages of the old pool's workers are dropped with its queue
+            shutdown_scraper_pool()
+            for site_name in list(self.running):
+                if site_name in stuck:
+                    kind, limit = stuck[site_name]
+                    record_timeout(site_name, kind, limit, self.running[site_name]['stats'].pages,
+                                   'scraper pool restarted', 'concurrent')
+                    self.end_task(site_name, timeout=kind)
+                else:
+                    self.end_task(site_name, error='Stopped by a scraper pool restart')
+
+    def end_task(self, site_name, error=None, timeout=None, worker_stats=None):
+        """Wrap up a site that finished, failed or timed out (a killed worker sends no stats)"""
+        run = self.running.pop(site_name)
+        self.task_sites.pop(run['task_id'], None)
+        worker_stats = worker_stats or {}
+        if not run['local']:
+            # Timeouts this process enforced on the worker
+            worker_stats = merge_run_stats(worker_stats, {
+                'timeouts': [event for event in get_watchdog_events() if event['site'] == site_name]})
+        self.worker_stats[site_name] = worker_stats
+        # Pages received before an error or timeout stay in the pipeline
+        self.finish_site(site_name, run['stats'])
+        if run['report']:
+            result = {'site': site_name, 'error': error, 'timeout': timeout, 'pages': run['stats'].pages,
+                      'total_ads': run['stats'].total_ads, 'page_budget': run['page_budget'],
+                      'worker_stats': self.worker_stats[site_name]}
+            # Queued behind the site's batches, so it comes out once they are all uploaded
+            self.translation_service.add_callback(lambda: self.completed.put(result))
+
+    def completed_sites(self):
+        """Take the results of dispatched sites whose listings are all uploaded, with their upload stats"""
+        results = []
+        while True:
+            try:
+                result = self.completed.get_nowait()
+            except queue.Empty:
+                return results
+            result['completeness'], result['new_ads'] = get_last_run_stats(result['site'])
+            results.append(result)
+
+    def run_scrapers_concurrently(self, scraper_files, current_config):
+        """Run site scrapers in a process pool, each worker process with its own browser"""
+        print(f"Running {len(scraper_files)} scrapers {self.concurrency} at a time "
+              f"(timeout {self.site_timeout}s per site or "
+              f"{get_int_setting('SCRAPER_SECONDS_PER_PAGE', SCRAPER_SECONDS_PER_PAGE)}s per planned page, "
+              f"{self.page_timeout}s per page)")
+
+        for scraper_path in scraper_files:
+            site_name = os.path.basename(scraper_path).replace('_scraper.py', '')
+            batch_size = current_config.get(site_name, 2)
+            print(f"\n=== Queued {site_name} scraper with batch_size={batch_size} ===")
+            self.start_task(site_name, scraper_path, batch_size, pop_site_prefetched(site_name))
+
+        try:
+            while self.running:
+                self.poll()
+        except BaseException:
+            # Sites still running would keep sending pages nobody reads
+            shutdown_scraper_pool()
+            raise
+
+    def run_all_scrapers(self, sites=None):
+        """Run all scrapers (or those of sites), sequentially or in a process pool (see SCRAPER_CONCURRENCY)"""
         try:
             # Run cleanup first
-            cleanup_stats = self.cleanup_service.cleanup_old_listings()
-            print(f"\nCleanup completed: {cleanup_stats['listings_deleted']} old listings removed")
+            self.cleanup_if_due()
             
-            current_config = self.get_adjusted_config()
+            current_config = self.get_adjusted_config(sites)
             
-            # Get scrapers directory path
-            scrapers_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'SCRAPERS')
-
             # Find all valid scraper files
-            scraper_files = [
-                os.path.join(scrapers_dir, f) 
-                for f in os.listdir(scrapers_dir)
-                if f.endswith('.py') 
-                and 'scraper' in f.lower() 
-                and 'leboncoin' not in f.lower()
-                and f != '__init__.py'
-                and os.path.splitext(f)[0].replace('_scraper', '') in current_config
-            ]
+            scraper_files = self.get_scraper_files(current_config)
 
             # Sort to ensure kleinanzeigen runs first, randomize the rest
             import random
@@ -153,18 +594,21 @@ class ScraperService:
             # Start translation service
             self.translation_service.start()
 
+            # Fetch server-rendered pages of all sites concurrently before the browsers start
+            self.prefetch_http_pages(scraper_files, current_config)
+
             # Run each scraper
-            for scraper_path in scraper_files:
-                site_name = os.path.basename(scraper_path).replace('_scraper.py', '')
-                stats = self.run_single_scraper(scraper_path)
-                self.scraper_results[site_name] = stats
+            if self.concurrency > 1:
+                self.run_scrapers_concurrently(scraper_files, current_config)
+            else:
+                for scraper_path in scraper_files:
+                    site_name = os.path.basename(scraper_path).replace('_scraper.py', '')
+                    stats = self.run_single_scraper(scraper_path)
+                    self.scraper_results[site_name] = stats
 
-            # Stop translation service
+            # Stop translation service (waits until every translated batch is uploaded in-process
+            # through upload_service.upload_data_to_mongo on the shared Mongo client)
             self.translation_service.stop()
-
-            # Upload translated data
-            print("Uploading translated JSONs to MongoDB...")
-            subprocess.run(["python", os.path.join(os.path.dirname(os.path.abspath(__file__)), "upload_service.py")])
             print("Upload completed.")
 
         finally:
@@ -175,9 +619,23 @@ class ScraperStats:
         self.total_ads = 0
         self.complete_ads = 0
         self.new_ads = 0
-        self.data = None
+        self.pages = 0
         self.category_stats = {}
 
+    def add_listings(self, listings):
+        """Count one page of scraped listings"""
+        for item in listings:
+            category = item.get('category', 'uncategorized')
+            if category not in self.category_stats:
+                self.category_stats[category] = {'total': 0, 'new': 0, 'complete': 0}
+            self.total_ads += 1
+            self.category_stats[category]['total'] += 1
+            if (item.get('link') and 
+                item.get('main_image') and 
+                item.get('title', {}).get('original')):
+                self.complete_ads += 1
+                self.category_stats[category]['complete'] += 1
+
 def calculate_completeness(data):
     """Calculate percentage of complete ads"""
     total_ads = 0
@@ -193,10 +651,10 @@ def calculate_completeness(data):
     
     return total_ads, complete_ads
 
-def run_scrapers():
-    """Main entry point for running scrapers"""
+def run_scrapers(sites=None):
+    """Main entry point for running scrapers (all of them, or those of the given sites)"""
     service = ScraperService()
-    service.run_all_scrapers()
+    service.run_all_scrapers(sites)
 
 if __name__ == "__main__":
     run_scrapers() 
\ No newline at end of file
@@ -0,0 +1,265 @@
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from datetime import datetime
+from .browser_supervisor import check_recycle, note_page
+from .crawl_state import crawl_key, get_crawl_state
+from .driver_service import quit_driver
+from .extraction import extract_page
+from .http_fetch import fetch_listings, record_browser_page, take_prefetched, uses_http
+from .page_budget import category_pages
+from .page_readiness import wait_for_page_ready
+from .parse_pool import ParsePipeline
+from .payload_capture import capture_listings, record_dom_page
+from .rate_limiter import wait_for_domain
+from .resource_policy import record_page_transfer
+from .tab_pool import get_tab_count, iter_ready_tabs, record_dropped_page
+import time
+
+def read_browser_page(driver, spec, category=None, accept_cookies=None, driver_state=None, pipeline=None):
+    """Read the listings of the results page showing in the browser
+
+    With a parse pipeline, a page_source parse may come back as a future (see extract_page).
+    """
+    site_name = spec['name']
+    note_page(site_name)
+
+    # Handle cookie popup before proceeding (but don't stop if it fails)
+    if accept_cookies and not driver_state.get('cookies_handled'):
+        accept_cookies(driver)
+        driver_state['cookies_handled'] = True
+
+    WebDriverWait(driver, 10).until(
+        EC.presence_of_element_located((By.TAG_NAME, spec['wait_tag']))
+    )
+
+    # Results shipped as data (embedded state or XHR) need no scrolling
+    listings = capture_listings(driver, spec, category)
+    if listings is not None:
+        record_page_transfer(driver, site_name)
+        return listings
+
+    # Scroll through the page until the cards and their images have loaded
+    wait_for_page_ready(driver, site_name, spec['card'],
+                        force_lazy_images=spec.get('force_lazy_images', False))
+
+    # Read the cards in the browser (page_source parse if that fails)
+    listings = extract_page(driver, spec, category, pipeline)
+    if spec.get('payload') and isinstance(listings, list):
+        record_dom_page(site_name, len(listings))
+    return listings
+
+def load_browser_page(driver, spec, page_url, category=None, accept_cookies=None, driver_state=None,
+                      pipeline=None):
+    """Load a results page in the browser and read its listings"""
+    # Get the page (once the site's rate limit allows) and wait for initial content
+    wait_for_domain(page_url)
+    driver.get(page_url)
+    return read_browser_page(driver, spec, category, accept_cookies, driver_state, pipeline)
+
+def fetch_without_browser(spec, page_url, category=None):
+    """Get a page prefetched by the crawl engine or fetched over HTTP
+
+    Returns (listings, fallback reason), listings None when the browser has to load the page.
+    """
+    if not uses_http(spec):
+        return None, None
+    prefetched = take_prefetched(spec['name'], page_url)
+    if prefetched is not None:
+        return prefetched[0], prefetched[1]
+    return fetch_listings(spec, page_url, category)
+
+def _stamp(listings, site_name, current_time):
+    for listing in listings:
+        listing['source'] = site_name
+        listing['scraped_at'] = current_time
+    return listings
+
+def _open(open_driver, site_name):
+    try:
+        return open_driver()
+    except Exception as e:
+        print(f"Error starting {site_name} driver: {e}")
+        return None
+
+def _iter_tabbed_pages(open_driver, spec, max_pages, tab_count, accept_cookies, driver_state, current_time):
+    """Crawl a site's pages with the browser's share loaded in several tabs at once (see tab_pool.py)"""
+    site_name = spec['name']
+    http_first = uses_http(spec)
+    marks = get_crawl_state()
+    stopped_keys = set()
+
+    # Pages that don't need the browser go out first
+    browser_jobs = []
+    for main_url, category in spec['urls']:
+        key = crawl_key(main_url, category)
+        budget = category_pages(site_name, category, max_pages)
+        page_limit = marks.page_limit(site_name, key, budget) if marks else budget
+        for page in range(1, page_limit + 1):
+            # Pages are taken in order, so a category stops at its first mostly known page
+            if key in stopped_keys:
+                break
+            page_url = spec['page_url'](main_url, page)
+            job = (page, page_url, category, key, page_limit)
+            listings, fallback_reason = fetch_without_browser(spec, page_url, category)
+            if listings is None:
+                browser_jobs.append(job + (fallback_reason,))
+                continue
+            yield page, _stamp(listings, site_name, current_time)
+            if marks and marks.observe(site_name, key, page, listings, page_limit):
+                stopped_keys.add(key)
+
+    try:
+        remaining = browser_jobs
+        while remaining:
+            driver = _open(open_driver, site_name)
+            if driver is None:
+                return
+
+            print(f"Loading {len(remaining)} {site_name} pages in {min(tab_count, len(remaining))} tabs")
+            handled = set()
+            recycle = False
+            # Pages can finish out of order, the pipeline handles each page on its own. Pages of a
+            # category that stopped are dropped before they load.
+            tabs = iter_ready_tabs(driver, site_name, remaining, lambda job: job[1], tab_count,
+                                   skip=lambda job: job[3] in stopped_keys)
+            try:
+                for job, ready in tabs:
+                    page, page_url, category, key, page_limit, fallback_reason = job
+                    handled.add(job)
+                    if not ready:
+                        print(f"Timeout loading {site_name} page {page} of {page_url}")
+                        record_dropped_page(site_name, page_url, 'tab_timeout')
+                        continue
+                    start_time = time.time()
+                    try:
+                        listings = read_browser_page(driver, spec, category, accept_cookies, driver_state)
+                    except Exception as e:
+                        print(f"Error scraping {site_name} page {page} of {page_url}: {e}")
+                        record_dropped_page(site_name, page_url, 'read_error')
+                        continue
+                    if http_first:
+                        record_browser_page(site_name, time.time() - start_time, fallback_reason)
+                    yield page, _stamp(listings, site_name, current_time)
+                    if marks and marks.observe(site_name, key, page, listings, page_limit):
+                        stopped_keys.add(key)
+                    # A browser past its page or memory limit is replaced (see browser_supervisor.py),
+                    # the pages still loading in its tabs go to the new one
+                    if check_recycle(site_name):
+                        recycle = True
+                        break
+            finally:
+                tabs.close()
+
+            if not recycle:
+                break
+            quit_driver(site_name)
+            remaining = [job for job in remaining if job not in handled and job[3] not in stopped_keys]
+    finally:
+        if marks:
+            marks.save_depths(site_name)
+
+def planned_pages(spec, max_pages):
+    """Get how many pages a site's crawl may go to this run, over all its categories"""
+    site_name = spec['name']
+    marks = get_crawl_state()
+    pages = 0
+    for main_url, category in spec['urls']:
+        budget = category_pages(site_name, category, max_pages)
+        pages += marks.page_limit(site_name, crawl_key(main_url, category), budget) if marks else budget
+    return pages
+
+def iter_site_pages(open_driver, spec, max_pages, accept_cookies=None, driver_state=None):
+    """Crawl the result pages of every URL in a site spec, yielding (page, listings) as each page is parsed
+
+    open_driver() returns the site's browser (None if it can't start). It is only called once a
+    page needs the browser, so sites whose pages all come over HTTP (see http_fetch.py) never start one.
+    accept_cookies(driver) runs on the first page loaded while driver_state has no
+    'cookies_handled' flag, so sites that clear their cookies can reset it.
+    """
+    site_name = spec['name']
+    driver_state = driver_state if driver_state is not None else {}
+    current_time = datetime.now().isoformat()
+    http_first = uses_http(spec)
+    driver = None
+
+    # Sites that stop on a page's content need their pages in order, one tab at a time
+    tab_count = get_tab_count(site_name)
+    if tab_count > 1 and not spec.get('stop_when'):
+        yield from _iter_tabbed_pages(open_driver, spec, max_pages, tab_count, accept_cookies,
+                                      driver_state, current_time)
+        return
+
+    # page_source parses run in parser processes while the browser moves on to the next page
+    pipeline = ParsePipeline(site_name)
+    stop_when = spec.get('stop_when')
+    browser_failed = False
+    # Categories stop at their first mostly known page (see crawl_state.py)
+    marks = get_crawl_state()
+    stopped_keys = set()
+    page_limits = {}
+
+    def handle_done(done):
+        for (key, done_page), done_listings in done:
+            yield done_page, _stamp(done_listings, site_name, current_time)
+            if stop_when and stop_when(done_listings):
+                stopped_keys.add(key)
+            if marks and marks.observe(site_name, key, done_page, done_listings, page_limits[key]):
+                stopped_keys.add(key)
+
+    try:
+        for main_url, category in spec['urls']:
+            if category:
+                print(f"\nScraping category: {category}")
+            key = crawl_key(main_url, category)
+            # The category's planned pages (see page_budget.py), stretched while its pages are still new
+            budget = category_pages(site_name, category, max_pages)
+            page_limits[key] = marks.page_limit(site_name, key, budget) if marks else budget
+            page = 1
+
+            while page <= page_limits[key]:
+                page_url = spec['page_url'](main_url, page)
+
+                # Server-rendered pages are tried with a plain GET first, unless the crawl engine already did
+                listings, fallback_reason = fetch_without_browser(spec, page_url, category)
+                browser_page = listings is None
+
+                if browser_page:
+                    if driver is None:
+                        driver = _open(open_driver, site_name)
+                        if driver is None:
+                            browser_failed = True
+                            break
+
+                    start_time = time.time()
+                    try:
+                        listings = load_browser_page(driver, spec, page_url, category, accept_cookies,
+                                                     driver_state, pipeline)
+                    except Exception as e:
+                        print(f"Error scraping {site_name} page {page} of {main_url}: {e}")
+                        break
+                    if http_first:
+                        record_browser_page(site_name, time.time() - start_time, fallback_reason)
+                    # A browser past its page or memory limit is replaced before the next page
+                    # (see browser_supervisor.py)
+                    if check_recycle(site_name):
+                        quit_driver(site_name)
+                        driver = None
+
+                # Sites that stop on a page's content wait for its parse, the others move on (and may
+                # load a page or two past their high-water mark while the parse catches up)
+                pipeline.add((key, page), listings)
+                yield from handle_done(pipeline.finish() if stop_when else pipeline.ready())
+                if key in stopped_keys:
+                    break
+                # Requests are spaced out per domain by the rate limiter (see rate_limiter.py)
+                page += 1
+
+            if browser_failed:
+                break
+
+        yield from handle_done(pipeline.finish())
+    finally:
+        pipeline.close()
+        if marks:
+            marks.save_depths(site_name)
@@ -0,0 +1,102 @@
+from os import getenv
+import heapq
+import random
+import time
+
+# Seconds between the end of a site's run and its next one. Busy feeds are scraped more often than
+# quiet ones, and each site runs as soon as its interval is up instead of waiting for every other site.
+# Override for all sites with SITE_INTERVAL, or for one site with SITE_INTERVAL_<SITE> (e.g. SITE_INTERVAL_DBA)
+DEFAULT_SITE_INTERVAL = 1200
+SITE_INTERVALS = {
+    'blocket': 600,
+    'kleinanzeigen': 600,
+    'marktplaats': 900,
+    'tori': 900,
+    'gumtree': 1200,
+    'olx': 1200,
+    'ricardo': 2400,
+    'dba': 2400,
+}
+# Fraction of an interval its next run is moved by at random, so sites drift apart instead of
+# lining up on the same schedule (override with SCHEDULE_JITTER)
+SCHEDULE_JITTER = 0.1
+# Seconds a site waits after its run failed
+SCHEDULE_RETRY_DELAY = 60
+# Seconds reported until the next run while every site is running
+SCHEDULE_POLL_INTERVAL = 30
+
+def get_site_interval(site_name):
+    """Get the seconds between a site's runs"""
+    value = getenv(f'SITE_INTERVAL_{site_name.upper()}') or getenv('SITE_INTERVAL')
+    try:
+        interval = int(value) if value else SITE_INTERVALS.get(site_name, DEFAULT_SITE_INTERVAL)
+    except ValueError:
+        interval = SITE_INTERVALS.get(site_name, DEFAULT_SITE_INTERVAL)
+    return max(1, interval)
+
+def get_schedule_jitter():
+    """Get the fraction of an interval a run is moved by at random"""
+    try:
+        jitter = float(getenv('SCHEDULE_JITTER', SCHEDULE_JITTER))
+    except ValueError:
+        jitter = SCHEDULE_JITTER
+    return min(max(jitter, 0.0), 1.0)
+
+class SiteScheduler:
+    """Keeps each site's next due time in a priority queue"""
+
+    def __init__(self, site_names):
+        self.queue = []
+        self.counter = 0
+        self.due = {}
+        self.runs = {}
+        now = time.time()
+        # Every site is due at start, like the first run of the old loop
+        for site_name in site_names:
+            self._push(site_name, now)
+            self.runs[site_name] = {'runs': 0, 'failures': 0, 'last_lag_seconds': None}
+
+    def _push(self, site_name, due):
+        self.counter += 1
+        self.due[site_name] = due
+        heapq.heappush(self.queue, (due, self.counter, site_name))
+
+    def seconds_until_next(self):
+        """Get the seconds until the next site is due (0 when one is due already)"""
+        if not self.queue:
+            return SCHEDULE_POLL_INTERVAL
+        return max(0.0, self.queue[0][0] - time.time())
+
+    def due_sites(self):
+        """Take every site that is due, most overdue first"""
+        now = time.time()
+        sites = []
+        while self.queue and self.queue[0][0] <= now:
+            due, _, site_name = heapq.heappop(self.queue)
+            sites.append(site_name)
+            self.runs[site_name]['last_lag_seconds'] = round(now - due, 1)
+        return sites
+
+    def reschedule(self, site_name, failed=False):
+        """Queue a site's next run, an interval (with jitter) after now or after the retry delay when it failed"""
+        if failed:
+            delay = SCHEDULE_RETRY_DELAY
+            self.runs[site_name]['failures'] += 1
+        else:
+            interval = get_site_interval(site_name)
+            jitter = get_schedule_jitter()
+            delay = interval * random.uniform(1 - jitter, 1 + jitter)
+            self.runs[site_name]['runs'] += 1
+        self._push(site_name, time.time() + delay)
+
+    def get_stats(self):
+        """Get each site's interval, runs, how late its last run started and when it is due next"""
+        now = time.time()
+        return {
+            site_name: {
+                'interval': get_site_interval(site_name),
+                **self.runs[site_name],
+                'next_run_in_seconds': round(max(0.0, self.due[site_name] - now), 1)
+            }
+            for site_name in sorted(self.runs)
+        }
@@ -0,0 +1,162 @@
+from datetime import datetime
+
+# Approximate fixed EUR rates per listing currency (you might want to use an API for real-time rates)
+EUR_RATES = {
+    'SEK': 0.087,
+    'DKK': 0.134,   # As of March 2024
+    'GBP': 1.17,
+    'RON': 0.202,
+    'CHF': 1.05,
+}
+
+# A site spec is a dict kept at the top of each scraper:
+#   'name'        - site name used for drivers, stats and the listing source
+#   'urls'        - [(url, category)] scraped in order, category None for single-category sites
+#   'page_url'    - page_url(url, page) builds the address of a results page
+#   'wait_tag'    - tag that must be present before the page counts as loaded
+#   'card'        - CSS selector of one listing card
+#   'fields'      - raw card fields, read in the browser or by a parse backend (see extraction.py)
+#   'skip'        - fields that drop the card when truthy (e.g. promoted listings)
+#   'require'     - fields that drop the card when empty ('title' checks all title fields)
+#   'base_url'    - prefix for relative links
+#   'title'       - {'fields': first non-empty field wins, 'max_words': truncation, 'translated': english = original}
+#   'description' - field holding the description; with None the listing gets an empty description
+#                   and without the key no description at all
+#   'image'       - {'srcset': fields whose widest entry wins ('srcset_entry': 'last' for the last one),
+#                    'src': plain fields tried after them, 'pick' + 'field': function choosing among a
+#                    list field's values, 'remove': substrings cut from the URL,
+#                    'drop_if': substring marking placeholder images}
+#   'price'       - {'remove': substrings cut before conversion, 'lowercase', 'decimal_comma': 1.234,56 style,
+#                    'number': int/float/str, 'requires': text that must appear, 'currency': listing currency,
+#                    'round_eur': round instead of truncate, 'format': 'both'/'eur'/'plain',
+#                    'none_without_text': price None instead of empty amounts}
+#   'timestamp'   - {'field', 'parse': text -> datetime, 'now_fallback': now when the text doesn't parse}
+#   'stop_when'   - stop_when(listings) ends the crawl after a page (e.g. once older posts show up)
+#   'payload'     - where the page ships its results as JSON, read instead of the cards (see payload_capture.py)
+# plus page loading options: 'force_lazy_images'.
+
+def widest_srcset_image(srcset):
+    """Get the URL of the widest image in a srcset"""
+    image_versions = []
+    for item in srcset.split(','):
+        parts = item.strip().split()
+        if not parts:
+            continue
+        width = parts[1] if len(parts) > 1 else ''
+        image_versions.append((parts[0], int(width[:-1]) if width.endswith('w') and width[:-1].isdigit() else 0))
+
+    # Get URL of highest resolution version
+    if image_versions:
+        return max(image_versions, key=lambda x: x[1])[0]
+    return None
+
+def last_srcset_image(srcset):
+    """Get the URL of the last entry of a srcset"""
+    entries = srcset.strip().split(', ')
+    if entries:
+        return entries[-1].split(' ')[0]
+    return None
+
+def parse_price(price_text, price_spec):
+    """Turn a card's price text into a number (or cleaned text) following the site's price spec"""
+    if not price_text:
+        return None
+    if price_spec.get('requires') and price_spec['requires'] not in price_text:
+        return None
+    cleaned = price_text.lower() if price_spec.get('lowercase') else price_text
+    for token in price_spec.get('remove', []):
+        cleaned = cleaned.replace(token, '')
+    if price_spec.get('decimal_comma'):
+        cleaned = cleaned.replace(',', '.')
+    cleaned = cleaned.strip()
+    number = price_spec.get('number', int)
+    try:
+        return number(cleaned)
+    except ValueError:
+        return None
+
+def convert_to_eur(amount, price_spec):
+    """Convert an amount in the site's currency to whole euros"""
+    currency = price_spec.get('currency', 'EUR')
+    if amount is None or currency == 'EUR':
+        return amount
+    eur = amount * EUR_RATES[currency]
+    return int(round(eur)) if price_spec.get('round_eur') else int(eur)
+
+def build_price(price_text, price_spec):
+    """Build the listing's price value in the site's format"""
+    if price_spec.get('none_without_text') and not price_text:
+        return None
+    amount = parse_price(price_text, price_spec)
+    price_format = price_spec.get('format', 'both')
+    if price_format == 'plain':
+        return convert_to_eur(amount, price_spec)
+    if price_format == 'eur':
+        return {'eur': convert_to_eur(amount, price_spec)}
+    return {
+        price_spec['currency'].lower(): amount,
+        'eur': convert_to_eur(amount, price_spec)
+    }
+
+def build_image(raw, image_spec):
+    """Pick the card's image URL following the site's image spec"""
+    image_url = image_spec['pick'](raw[image_spec['field']]) if image_spec.get('pick') else None
+
+    # The first srcset present decides, like the <source> order in a <picture>
+    srcset = next((raw[field] for field in image_spec.get('srcset', []) if raw[field]), None)
+    if not image_url and srcset:
+        pick_srcset = last_srcset_image if image_spec.get('srcset_entry') == 'last' else widest_srcset_image
+        image_url = pick_srcset(srcset)
+
+    if not image_url:
+        image_url = next((raw[field] for field in image_spec.get('src', []) if raw[field]), None)
+    if not image_url:
+        return None
+    if image_spec.get('drop_if') and image_spec['drop_if'] in image_url:
+        return None
+    for token in image_spec.get('remove', []):
+        image_url = image_url.replace(token, '')
+    return image_url
+
+def build_card_listing(spec, raw, category=None):
+    """Build a listing from a card's raw fields following the site spec (None for skipped cards)"""
+    if any(raw[field] for field in spec.get('skip', [])):
+        return None
+
+    title_spec = spec.get('title', {})
+    title = next((raw[field] for field in title_spec.get('fields', ['title']) if raw[field]), None)
+    if title and title_spec.get('max_words'):
+        title = ' '.join(title.split()[:title_spec['max_words']])
+
+    # 'title' in require means any of the title fields
+    if not all(title if field == 'title' else raw[field] for field in spec.get('require', [])):
+        return None
+
+    link = raw['link']
+    if link and spec.get('base_url'):
+        link = spec['base_url'] + link
+
+    timestamp = None
+    timestamp_spec = spec.get('timestamp')
+    if timestamp_spec and raw[timestamp_spec['field']]:
+        timestamp = timestamp_spec['parse'](raw[timestamp_spec['field']])
+    if timestamp is None and (not timestamp_spec or timestamp_spec.get('now_fallback')):
+        timestamp = datetime.now()
+
+    listing = {
+        'title': {
+            'original': title,
+            'english': title if title_spec.get('translated') else None
+        }
+    }
+    if 'description' in spec:
+        listing['description'] = raw[spec['description']] if spec['description'] else None
+    listing.update({
+        'main_image': build_image(raw, spec.get('image', {})),
+        'link': link or None,
+        'price': build_price(raw['price'], spec.get('price', {})),
+        'timestamp': timestamp.isoformat() if timestamp else None
+    })
+    if category is not None:
+        listing['category'] = category
+    return listing
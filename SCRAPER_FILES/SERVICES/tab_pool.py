@@ -0,0 +1,167 @@
+from os import getenv
+from .rate_limiter import wait_for_domain
+from .resource_policy import apply_resource_policy
+import threading
+import time
+
+# Tabs loading result pages side by side in a site's one browser. While one tab is scrolled and read
+# the others keep loading, for the memory cost of a single Chrome. 1 keeps the one-tab page loop.
+# Override for all sites with TAB_COUNT, or for one site with TAB_COUNT_<SITE> (e.g. TAB_COUNT_BLOCKET)
+DEFAULT_TAB_COUNT = 1
+SITE_TAB_COUNTS = {
+    'blocket': 3,
+    'tori': 3,
+    'kleinanzeigen': 3,
+    'marktplaats': 3,
+}
+# Seconds a tab may take to start showing its page before it is given up
+TAB_LOAD_TIMEOUT = 20
+# Seconds between sweeps over the loading tabs
+TAB_POLL_INTERVAL = 0.25
+
+# The flag marks the page being left, so a tab isn't taken as ready while the old page still shows
+_NAVIGATE_SCRIPT = "window.__tabPoolLeaving = true; window.location.href = arguments[0];"
+_READY_SCRIPT = """
+return !window.__tabPoolLeaving && window.location.href !== 'about:blank' &&
+    document.readyState !== 'loading';
+"""
+
+# Tabs used, pages read and time spent per site for the current run
+_tab_stats = {}
+_stats_lock = threading.Lock()
+
+def get_tab_count(site_name):
+    """Get the number of tabs a site's pages are loaded in"""
+    value = getenv(f'TAB_COUNT_{site_name.upper()}') or getenv('TAB_COUNT')
+    try:
+        count = int(value) if value else SITE_TAB_COUNTS.get(site_name, DEFAULT_TAB_COUNT)
+    except ValueError:
+        count = SITE_TAB_COUNTS.get(site_name, DEFAULT_TAB_COUNT)
+    return max(1, count)
+
+def reset_tab_stats():
+    """Reset the tab pool stats for a new scraper run"""
+    with _stats_lock:
+        _tab_stats.clear()
+
+def get_tab_stats():
+    """Get tabs used, pages read and pages per minute per site for the current run"""
+    with _stats_lock:
+        stats = {}
+        for site, site_stats in _tab_stats.items():
+            stats[site] = {
+                'tabs': site_stats['tabs'],
+                'pages': site_stats['pages'],
+                'timeouts': site_stats['timeouts'],
+                # Pages given up on (tab timeout or read error), so their listings are missing from the run
+                'dropped_pages': len(site_stats['dropped']),
+                'dropped': list(site_stats['dropped']),
+                'avg_page_seconds': (round(sum(site_stats['page_seconds']) / len(site_stats['page_seconds']), 2)
+                                     if site_stats['page_seconds'] else None),
+                'pages_per_minute': (round(site_stats['pages'] / site_stats['seconds'] * 60, 1)
+                                     if site_stats['seconds'] else None)
+            }
+        return stats
+
+def _site_stats(site_name):
+    return _tab_stats.setdefault(site_name, {
+        'tabs': 0, 'pages': 0, 'timeouts': 0, 'page_seconds': [], 'seconds': 0, 'dropped': []
+    })
+
+def record_dropped_page(site_name, page_url, reason):
+    """Count a page loaded in a tab whose listings couldn't be read ('tab_timeout' or 'read_error')"""
+    with _stats_lock:
+        _site_stats(site_name)['dropped'].append({'url': page_url, 'reason': reason})
+
+class TabPool:
+    """Tabs of one browser that load pages side by side"""
+
+    def __init__(self, driver, site_name, size):
+        self.driver = driver
+        self.site_name = site_name
+        self.main_handle = driver.current_window_handle
+        self.handles = [self.main_handle]
+        for _ in range(size - 1):
+            try:
+                driver.switch_to.new_window('tab')
+            except Exception as e:
+                print(f"Warning: Could not open another {site_name} tab: {e}")
+                break
+            # Resource blocking is set per tab
+            apply_resource_policy(site_name, driver)
+            self.handles.append(driver.current_window_handle)
+        driver.switch_to.window(self.main_handle)
+
+    def start(self, handle, url):
+        """Start loading a page in a tab (once the site's rate limit allows) without waiting for it"""
+        wait_for_domain(url)
+        self.driver.switch_to.window(handle)
+        self.driver.execute_script(_NAVIGATE_SCRIPT, url)
+
+    def is_ready(self, handle):
+        """Switch to a tab and check whether its new page has started showing"""
+        self.driver.switch_to.window(handle)
+        try:
+            return bool(self.driver.execute_script(_READY_SCRIPT))
+        except Exception:
+            # The page is being swapped while the script runs
+            return False
+
+    def close(self):
+        """Close the extra tabs, leaving the browser on its first one"""
+        for handle in self.handles[1:]:
+            try:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            except Exception as e:
+                print(f"Warning: Could not close {self.site_name} tab: {e}")
+        try:
+            self.driver.switch_to.window(self.main_handle)
+        except Exception:
+            pass
+        self.handles = [self.main_handle]
+
+def iter_ready_tabs(driver, site_name, jobs, page_url, tab_count, skip=None):
+    """Load jobs across a pool of tabs, yielding (job, ready) with the driver switched to the job's tab
+
+    page_url(job) gives the address to load. The caller reads the page before taking the next job,
+    after which that tab loads the next page. ready is False when the tab timed out.
+    Jobs for which skip(job) is true by the time a tab is free are dropped.
+    """
+    pending = list(jobs)
+    pool = TabPool(driver, site_name, min(tab_count, len(pending)))
+    loading = {}
+    start_time = time.time()
+    with _stats_lock:
+        site_stats = _site_stats(site_name)
+        site_stats['tabs'] = max(site_stats['tabs'], len(pool.handles))
+
+    try:
+        while pending or loading:
+            for handle in pool.handles:
+                while handle not in loading and pending:
+                    job = pending.pop(0)
+                    if skip and skip(job):
+                        continue
+                    pool.start(handle, page_url(job))
+                    loading[handle] = (job, time.time())
+
+            progressed = False
+            for handle, (job, started) in list(loading.items()):
+                ready = pool.is_ready(handle)
+                if not ready and time.time() - started < TAB_LOAD_TIMEOUT:
+                    continue
+                del loading[handle]
+                progressed = True
+                yield job, ready
+                with _stats_lock:
+                    site_stats['pages' if ready else 'timeouts'] += 1
+                    if ready:
+                        site_stats['page_seconds'].append(time.time() - started)
+
+            if not progressed:
+                time.sleep(TAB_POLL_INTERVAL)
+    finally:
+        pool.close()
+        with _stats_lock:
+            site_stats['seconds'] += time.time() - start_time
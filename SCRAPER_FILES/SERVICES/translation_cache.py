@@ -0,0 +1,154 @@
+from os import getenv, makedirs, path
+import sqlite3
+import threading
+import time
+
+# Cache location and eviction settings, each can be overridden with the environment variable of the same name
+CACHE_CONFIG = {
+    'TRANSLATION_CACHE_PATH': path.join(path.dirname(path.dirname(path.abspath(__file__))), 'cache', 'translations.sqlite3'),
+    'TRANSLATION_CACHE_TTL_DAYS': 30,
+    'TRANSLATION_CACHE_MAX_ENTRIES': 200000,
+    # Inserts between evictions, so a long-running scheduler keeps the cache within its limits
+    'TRANSLATION_CACHE_EVICT_EVERY': 5000,
+}
+
+# Source language of each site's titles, part of the cache key
+SITE_LANGUAGES = {
+    'blocket': 'sv',
+    'tori': 'fi',
+    'dba': 'da',
+    'kleinanzeigen': 'de',
+    'ricardo': 'de',
+    'marktplaats': 'nl',
+    'olx': 'ro',
+    'leboncoin': 'fr',
+    'gumtree': 'en'
+}
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH_SIZE = 500
+
+# Hit/miss counters per site for the current run
+_cache_stats = {}
+
+def reset_cache_stats(site_name=None):
+    """Reset the hit/miss counters for a new scraper run (of one site, or of every site)"""
+    if site_name is None:
+        _cache_stats.clear()
+    else:
+        _cache_stats.pop(site_name, None)
+
+def get_cache_stats():
+    """Get the hit/miss counters per site for the current run"""
+    return {site: dict(stats) for site, stats in _cache_stats.items()}
+
+def normalize_title(title):
+    """Build the cache key for a title: collapsed whitespace, case-insensitive"""
+    return ' '.join(title.split()).casefold()
+
+class TranslationCache:
+    def __init__(self, db_path=None, ttl_days=None, max_entries=None):
+        self.db_path = db_path or getenv('TRANSLATION_CACHE_PATH', CACHE_CONFIG['TRANSLATION_CACHE_PATH'])
+        self.ttl_seconds = 24 * 60 * 60 * float(
+            ttl_days or getenv('TRANSLATION_CACHE_TTL_DAYS', CACHE_CONFIG['TRANSLATION_CACHE_TTL_DAYS']))
+        self.max_entries = int(
+            max_entries or getenv('TRANSLATION_CACHE_MAX_ENTRIES', CACHE_CONFIG['TRANSLATION_CACHE_MAX_ENTRIES']))
+        self.evict_every = max(1, int(
+            getenv('TRANSLATION_CACHE_EVICT_EVERY', CACHE_CONFIG['TRANSLATION_CACHE_EVICT_EVERY'])))
+        self.inserts_since_evict = 0
+
+        makedirs(path.dirname(self.db_path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS translations (
+                    source_lang TEXT NOT NULL,
+                    title_key TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL,
+                    PRIMARY KEY (source_lang, title_key)
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used_at)")
+        self.evict()
+
+    def get_many(self, site_name, titles):
+        """Look up titles for a site, returning {title: translation} for the hits"""
+        source_lang = SITE_LANGUAGES.get(site_name, site_name)
+        keys = {}
+        for title in titles:
+            keys.setdefault(normalize_title(title), []).append(title)
+
+        now = time.time()
+        fresh_after = now - self.ttl_seconds
+        found = {}
+        key_list = list(keys)
+        with self.lock:
+            for start in range(0, len(key_list), _LOOKUP_BATCH_SIZE):
+                batch = key_list[start:start + _LOOKUP_BATCH_SIZE]
+                placeholders = ','.join('?' * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT title_key, translation FROM translations "
+                    f"WHERE source_lang = ? AND created_at >= ? AND title_key IN ({placeholders})",
+                    [source_lang, fresh_after, *batch]
+                ).fetchall()
+                found.update(rows)
+
+            # Touch the hits so LRU eviction keeps them
+            if found:
+                with self.conn:
+                    self.conn.executemany(
+                        "UPDATE translations SET last_used_at = ? WHERE source_lang = ? AND title_key = ?",
+                        [(now, source_lang, key) for key in found]
+                    )
+
+        hits = {}
+        for key, translation in found.items():
+            for title in keys[key]:
+                hits[title] = translation
+
+        site_stats = _cache_stats.setdefault(site_name, {'hits': 0, 'misses': 0})
+        hit_count = sum(1 for title in titles if title in hits)
+        site_stats['hits'] += hit_count
+        site_stats['misses'] += len(titles) - hit_count
+        return hits
+
+    def put_many(self, site_name, translations):
+        """Store (title, translation) pairs for a site"""
+        source_lang = SITE_LANGUAGES.get(site_name, site_name)
+        now = time.time()
+        rows = [(source_lang, normalize_title(title), translation, now, now)
+                for title, translation in translations if title and translation]
+        if not rows:
+            return
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO translations (source_lang, title_key, translation, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self.inserts_since_evict += len(rows)
+            evict_due = self.inserts_since_evict >= self.evict_every
+        if evict_due:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones above max_entries"""
+        with self.lock, self.conn:
+            self.inserts_since_evict = 0
+            self.conn.execute("DELETE FROM translations WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            count = self.conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            if count > self.max_entries:
+                self.conn.execute(
+                    "DELETE FROM translations WHERE rowid IN "
+                    "(SELECT rowid FROM translations ORDER BY last_used_at LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+
+    def close(self):
+        """Evict old entries and close the cache file"""
+        self.evict()
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,99 @@
+from deep_translator import GoogleTranslator
+from deep_translator.exceptions import RequestError, TooManyRequests
+from concurrent.futures import ThreadPoolExecutor
+from os import getenv
+from .rate_limiter import TokenBucket
+import random
+import threading
+import time
+
+# Translation throughput settings, each can be overridden with the environment variable of the same name
+TRANSLATION_CONFIG = {
+    'TRANSLATION_CONCURRENCY': 4,         # Chunks in flight at once
+    'TRANSLATION_RATE_PER_SECOND': 2.0,   # Requests per second across all threads
+    'TRANSLATION_BURST': 4,               # Requests allowed back to back after an idle spell
+    'TRANSLATION_MAX_RETRIES': 4,         # Retries for a throttled or failed request
+    'TRANSLATION_BACKOFF_SECONDS': 2.0,   # First retry delay, doubled on every retry
+}
+
+# Per-chunk latency per site for the current run
+_latency_stats = {}
+_stats_lock = threading.Lock()
+
+def get_translation_setting(name):
+    """Get a translation setting from the environment, falling back to TRANSLATION_CONFIG"""
+    default = TRANSLATION_CONFIG[name]
+    try:
+        return type(default)(getenv(name, default))
+    except ValueError:
+        return default
+
+def reset_translation_stats(site_name=None):
+    """Reset the chunk latency stats for a new scraper run (of one site, or of every site)"""
+    with _stats_lock:
+        if site_name is None:
+            _latency_stats.clear()
+        else:
+            _latency_stats.pop(site_name, None)
+
+def get_translation_stats():
+    """Get chunk count and latency summary per site for the current run"""
+    with _stats_lock:
+        return {
+            site: {
+                'chunks': len(latencies),
+                'avg_latency': round(sum(latencies) / len(latencies), 2),
+                'max_latency': round(max(latencies), 2)
+            }
+            for site, latencies in _latency_stats.items() if latencies
+        }
+
+class TranslationExecutor:
+    """Translates chunks on a bounded thread pool behind a shared rate limiter"""
+
+    def __init__(self):
+        self.concurrency = max(1, get_translation_setting('TRANSLATION_CONCURRENCY'))
+        self.max_retries = get_translation_setting('TRANSLATION_MAX_RETRIES')
+        self.backoff_seconds = get_translation_setting('TRANSLATION_BACKOFF_SECONDS')
+        self.rate_limiter = TokenBucket(
+            get_translation_setting('TRANSLATION_RATE_PER_SECOND'),
+            get_translation_setting('TRANSLATION_BURST')
+        )
+        self.pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='translate')
+        self.local = threading.local()
+
+    def _translator(self):
+        """Get this thread's translator (instances keep per-request state)"""
+        if not hasattr(self.local, 'translator'):
+            self.local.translator = GoogleTranslator(source='auto', target='en')
+        return self.local.translator
+
+    def translate(self, text, site_name=None):
+        """Translate one request, waiting for the rate limiter and backing off when throttled"""
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            start_time = time.time()
+            try:
+                translated = self._translator().translate(text)
+                self._record_latency(site_name, time.time() - start_time)
+                return translated
+            except (TooManyRequests, RequestError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_seconds * (2 ** attempt) * random.uniform(0.8, 1.2)
+                print(f"Translation throttled ({type(e).__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def _record_latency(self, site_name, seconds):
+        with _stats_lock:
+            _latency_stats.setdefault(site_name or 'unknown', []).append(seconds)
+
+    def map(self, fn, items):
+        """Run fn over items on the pool, returning the results in order"""
+        return list(self.pool.map(fn, items))
+
+    def shutdown(self):
+        """Stop the pool threads"""
+        self.pool.shutdown(wait=True)
@@ -1,22 +1,23 @@
 from deep_translator import GoogleTranslator
-import json
-import time
 from queue import Queue
 import threading
-from pymongo import MongoClient
-from datetime import datetime
-from pymongo.errors import BulkWriteError
-from pymongo import UpdateOne
 from .upload_service import upload_data_to_mongo
-import re
-import traceback
+from .translation_cache import TranslationCache
+from .translation_executor import TranslationExecutor, get_translation_stats
+from .rate_limiter import wait_for_domain
+
+# Marks the start of each title in a chunk, followed by its 4-digit index
+SEPARATOR_BASE = "§§INDEX=="
+# The translator's requests are rate limited under this address's domain
+TRANSLATE_URL = "https://translate.google.com"
 
 class TranslationService:
     def __init__(self):
         self.translation_queue = Queue()
-        self.translator = GoogleTranslator(source='auto', target='en')
+        self.executor = TranslationExecutor()
         self.translation_thread = None
         self.results = {}  # Initialize results dictionary
+        self.cache = TranslationCache()
 
     def start(self):
         """Start the translation worker thread"""
@@ -29,25 +30,31 @@ class TranslationService:
         if self.translation_thread:
             self.translation_queue.join()
             self.translation_thread.join()
+        self.executor.shutdown()
+        self.cache.close()
+
+    def add_callback(self, callback):
+        """Call callback (in the translation thread) once every batch queued before it is uploaded"""
+        self.translation_queue.put(callback)
 
-    def add_to_queue(self, site_name, data):
-        """Add data to translation queue"""
-        # Initialize results for this site
-        self.results[site_name] = {}
+    def add_to_queue(self, site_name, data, known_stats=None):
+        """Add data to translation queue (known_stats counts listings already dropped as stored)"""
+        # Initialize results for this site (sites queue one batch per scraped page)
+        self.results.setdefault(site_name, {})
         # Initialize category stats from the data
         for page in data.values():
             for item in page:
                 category = item.get('category', 'uncategorized')
                 if category not in self.results[site_name]:
                     self.results[site_name][category] = {'total': 0, 'new': 0, 'complete': 0}
-        self.translation_queue.put((site_name, data))
+        self.translation_queue.put((site_name, data, known_stats))
 
     def _split_into_chunks(self, titles, max_length=3500):
         """Split titles into chunks for translation"""
         chunks = []
         current_chunk = []
         current_length = 0
-        separator_length = len("§§INDEX==0000 ")  # Length of our separator
+        separator_length = len(f"{SEPARATOR_BASE}0000 ")  # Length of our separator
 
         for title in titles:
             # Account for title length plus separator
@@ -69,6 +76,63 @@ class TranslationService:
 
         return chunks
 
+    def _parse_indexed_translation(self, translated_chunk, chunk_size):
+        """Split an indexed translation into {local index: text}, or None if the separators didn't survive"""
+        translations = translated_chunk.split(SEPARATOR_BASE)
+
+        # Anything before the first separator means a title lost its marker
+        if translations and translations[0].strip():
+            return None
+
+        parsed = {}
+        for trans in translations[1:]:
+            # First get the 4-digit index at the start
+            index_str = trans[:4]
+            if not index_str.isdigit():
+                return None
+            index = int(index_str)
+            # Get everything after the index number
+            translation = trans[4:].strip()
+            if index >= chunk_size or index in parsed or not translation:
+                return None
+            parsed[index] = translation
+
+        # Every title must come back exactly once
+        if len(parsed) != chunk_size:
+            return None
+        return parsed
+
+    def _translate_chunk(self, site_name, chunk_index, chunk, chunk_offset, translated_titles):
+        """Translate one chunk into its slots of translated_titles, returning the number of titles left untranslated"""
+        try:
+            if len(chunk) == 1:
+                # A single title needs no separator, so it can't be misaligned
+                translated_titles[chunk_offset] = self.executor.translate(chunk[0], site_name).strip() or None
+                return 0 if translated_titles[chunk_offset] else 1
+
+            # Add the chunk-local index to each title's separator with padding
+            indexed_titles = [f"{SEPARATOR_BASE}{str(i).zfill(4)} {title}"
+                              for i, title in enumerate(chunk)]
+            chunk_text = " ".join(indexed_titles)
+
+            translated_chunk = self.executor.translate(chunk_text, site_name)
+        except Exception as e:
+            # Slots stay None, so these titles fall back to their original text
+            print(f"Translation error for chunk {chunk_index}: {str(e)}")
+            return len(chunk)
+
+        parsed = self._parse_indexed_translation(translated_chunk, len(chunk))
+        if parsed is not None:
+            for index, translation in parsed.items():
+                translated_titles[chunk_offset + index] = translation
+            return 0
+
+        # Separators were lost or mangled: resend each half so one bad title doesn't cost the whole chunk
+        middle = len(chunk) // 2
+        print(f"Chunk {chunk_index} of {site_name} came back misaligned, retrying {len(chunk)} titles in halves")
+        return (self._translate_chunk(site_name, chunk_index, chunk[:middle], chunk_offset, translated_titles) +
+                self._translate_chunk(site_name, chunk_index, chunk[middle:], chunk_offset + middle, translated_titles))
+
     def _translation_worker(self):
         """Worker that handles translations from the queue"""
         while True:
@@ -76,19 +140,15 @@ class TranslationService:
                 item = self.translation_queue.get()
                 if item is None:  # Poison pill
                     break
+                if callable(item):
+                    item()
+                    continue
 
-                site_name, data = item
-                
-                # Use a more unique separator that won't appear in translations
-                SEPARATOR_BASE = "§§INDEX=="  # More distinct separator
+                site_name, data, known_stats = item
                 
                 # Collect all titles with their references
                 translations_needed = []
                 title_refs = []
-                debug_data = {
-                    'site_name': site_name,
-                    'chunks': []
-                }
 
                 # Iterate through all pages and ads
                 for page_data in data.values():
@@ -98,105 +158,56 @@ class TranslationService:
                             title_refs.append(ad['title'])
 
                 if translations_needed:
-                    chunks = self._split_into_chunks(translations_needed)
-                    translated_titles = [None] * len(translations_needed)  # Pre-initialize with None
-                    chunk_offset = 0  # Track overall position in translations_needed
+                    # Reuse earlier translations and only send the misses (once each) to the remote service
+                    cached_titles = self.cache.get_many(site_name, translations_needed)
+                    to_translate = list(dict.fromkeys(
+                        title for title in translations_needed if title not in cached_titles))
+                    print(f"Translation cache for {site_name}: {len(translations_needed) - len(to_translate)} hits, "
+                          f"{len(to_translate)} titles to translate")
+
+                    chunks = self._split_into_chunks(to_translate)
+                    translated_titles = [None] * len(to_translate)  # Pre-initialize with None
 
+                    # Every chunk knows its offset up front, so chunks can be translated concurrently
+                    chunk_jobs = []
+                    chunk_offset = 0  # Track overall position in to_translate
                     for chunk_index, chunk in enumerate(chunks):
-                        chunk_debug = {
-                            'chunk_index': chunk_index,
-                            'original_titles': chunk,
-                            'chunk_offset': chunk_offset,  # Add offset to debug data
-                            'indexed_chunk_text': '',
-                            'translated_chunk': '',
-                            'split_translations': []
-                        }
-                        
-                        try:
-                            # Add index to each title's separator with padding
-                            indexed_titles = [f"{SEPARATOR_BASE}{str(i + chunk_offset).zfill(4)} {title}" 
-                                               for i, title in enumerate(chunk)]
-                            chunk_text = " ".join(indexed_titles)
-                            chunk_debug['indexed_chunk_text'] = chunk_text
-                            
-                            translated_chunk = self.translator.translate(chunk_text)
-                            chunk_debug['translated_chunk'] = translated_chunk
-                            
-                            # Process each translation except the last empty one
-                            translations = translated_chunk.split(SEPARATOR_BASE)
-                            
-                            # Skip the first empty element if it exists
-                            if translations and not translations[0].strip():
-                                translations = translations[1:]
-                            
-                            for trans in translations:
-                                if not trans.strip():
-                                    continue
-                                    
-                                # First get the 4-digit index at the start
-                                index_str = trans[:4]
-                                if index_str.isdigit():
-                                    index = int(index_str)
-                                    # Get everything after the index number
-                                    translation = trans[4:].strip()
-                                    
-                                    if 0 <= index < len(translated_titles):
-                                        translated_titles[index] = translation
-                                        chunk_debug['split_translations'].append({
-                                            'index': index,
-                                            'translation': translation
-                                        })
-                                    
-                            time.sleep(1)  # Rate limiting
-                            chunk_offset += len(chunk)  # Increment offset by chunk size
-                        except Exception as e:
-                            error_msg = f"Translation error for chunk {chunk_index}: {str(e)}"
-                            print(error_msg)
-                            chunk_debug['error'] = error_msg
-                            # Use original titles for this chunk on error
-                            for i, title in enumerate(chunk):
-                                if i < len(translated_titles):
-                                    translated_titles[i] = title
-
-                        # finally:
-                        #     debug_data['chunks'].append(chunk_debug)
-
-                    # Save debug data to JSON files
-                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                    
-                    # Save raw translation process debug data
-                    # process_debug_filename = f'translation_process_{site_name}_{timestamp}.json'
-                    # with open(process_debug_filename, 'w', encoding='utf-8') as f:
-                    #     json.dump(debug_data, f, ensure_ascii=False, indent=2)
-                    
-                    # Save simple comparison of original vs translated titles
-                    # comparison_data = {
-                    #     'site_name': site_name,
-                    #     'timestamp': timestamp,
-                    #     'translations': [
-                    #         {
-                    #             'index': i,
-                    #             'original': title_refs[i]['original'],
-                    #             'translated': translated_titles[i] if translated_titles[i] else title_refs[i]['original']
-                    #         }
-                    #         for i in range(len(title_refs))
-                    #     ]
-                    # }
-                    
-                    # comparison_filename = f'translation_results_{site_name}_{timestamp}.json'
-                    # with open(comparison_filename, 'w', encoding='utf-8') as f:
-                    #     json.dump(comparison_data, f, ensure_ascii=False, indent=2)
+                        chunk_jobs.append((chunk_index, chunk, chunk_offset))
+                        chunk_offset += len(chunk)  # Increment offset by chunk size
+
+                    untranslated = sum(self.executor.map(
+                        lambda job: self._translate_chunk(site_name, *job, translated_titles),
+                        chunk_jobs
+                    ))
+                    if untranslated:
+                        print(f"{untranslated} {site_name} titles could not be translated, keeping the original text")
+
+                    latency = get_translation_stats().get(site_name)
+                    if latency:
+                        print(f"Translated {site_name} chunks: {latency['chunks']} requests, "
+                              f"avg {latency['avg_latency']}s, max {latency['max_latency']}s")
+
+                    # Only verified translations are filled in, so every filled slot can be cached
+                    self.cache.put_many(site_name, [
+                        (title, translation.strip())
+                        for title, translation in zip(to_translate, translated_titles) if translation
+                    ])
 
                     # Update original data structure with position-verified translations
-                    for i, (title_obj, translation) in enumerate(zip(title_refs, translated_titles)):
+                    translations = dict(zip(to_translate, translated_titles))
+                    translations.update(cached_titles)
+                    for title_obj, title in zip(title_refs, translations_needed):
+                        translation = translations.get(title)
                         title_obj['english'] = translation.strip() if translation else title_obj['original']
 
-                    # Handle the translated data
-                    _, new_ads, _, category_stats = upload_data_to_mongo(site_name, data)
-                    
-                    # Update category stats
-                    for category, stats in category_stats.items():
-                        self.results[site_name][category] = stats
+                # Handle the translated data (also when every listing was already stored, to keep the stats)
+                _, new_ads, _, category_stats = upload_data_to_mongo(site_name, data, known_stats)
+                
+                # Add this batch to the site's category stats
+                for category, stats in category_stats.items():
+                    site_stats = self.results[site_name].setdefault(category, {'total': 0, 'new': 0, 'complete': 0})
+                    for key in site_stats:
+                        site_stats[key] += stats[key]
 
             except Exception as e:
                 print(f"Error in translation worker: {e}")
@@ -255,9 +266,10 @@ def translate_listings(data, site_name):
 
         for chunk in chunks:
             single_string = ". ".join(chunk)
+            # Be nice to the translation service (see rate_limiter.py)
+            wait_for_domain(TRANSLATE_URL)
             translated_chunk = translator.translate(single_string)
             translated_titles.extend(translated_chunk.split(". "))
-            time.sleep(1)  # Be nice to the translation service
 
         # Map translations back to listings
         for original, translated in zip(all_titles, translated_titles[:len(all_titles)]):
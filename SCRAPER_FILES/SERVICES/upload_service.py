@@ -1,42 +1,73 @@
-from pymongo import MongoClient
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
 from datetime import datetime
 from os import getenv
-from dotenv import load_dotenv
-
-# Store last run stats
-_last_run_stats = {'completeness': {}, 'new_ads': {}}
-
-def reset_stats():
-    """Reset the statistics for a new scraper run"""
-    global _last_run_stats
-    _last_run_stats = {'completeness': {}, 'new_ads': {}}
-
-def upload_data_to_mongo(site_name, data):
-    """Upload translated data to MongoDB"""
-    load_dotenv()
-    mongo_uri = getenv('MONGODB_URI')
-    if not mongo_uri:
-        raise ValueError("MONGODB_URI environment variable not set")
-        
-    client = MongoClient(mongo_uri)
-    db = client['fleatronics']
-    collection = db['listings']
-
-    # Create a unique compound index
-    collection.create_index([
-        ("link", 1),
-        ("source", 1)
-    ], unique=True)
-
-    total_ads = 0
+from .mongo_service import get_listings_collection
+
+# Number of upserts sent per bulk_write call (override with UPLOAD_BATCH_SIZE)
+UPLOAD_BATCH_SIZE = 1000
+
+# Raw per-site, per-category counts for the current run, summed over every upload call
+_run_counts = {}
+
+def reset_stats(site_name=None):
+    """Reset the statistics for a new scraper run (of one site, or of every site)"""
+    if site_name is None:
+        _run_counts.clear()
+    else:
+        _run_counts.pop(site_name, None)
+
+def get_upload_batch_size():
+    """Get the configured number of upserts per bulk write"""
+    try:
+        return max(1, int(getenv('UPLOAD_BATCH_SIZE', UPLOAD_BATCH_SIZE)))
+    except ValueError:
+        return UPLOAD_BATCH_SIZE
+
+def _upserted_indexes(collection, operations):
+    """Send one unordered bulk upsert and return the batch indexes that were inserted"""
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        return set(result.upserted_ids.keys())
+    except BulkWriteError as e:
+        # Unordered batches keep going past failed writes, so still count what got in
+        print(f"Error inserting documents: {len(e.details.get('writeErrors', []))} failed writes")
+        return {upsert['index'] for upsert in e.details.get('upserted', [])}
+    except PyMongoError as e:
+        # A lost connection drops this batch only, the next batches and sites still go out
+        print(f"Error inserting documents: batch of {len(operations)} failed: {e}")
+        return set()
+
+def upload_data_to_mongo(site_name, data, known_stats=None):
+    """Upload translated data to MongoDB
+
+    known_stats holds per-category counts for listings already dropped as stored
+    (see DatabaseService.filter_new_listings) so they still count towards the totals.
+    """
+    # Track stats by category, starting from the listings dropped before upload
+    category_stats = {category: dict(stats) for category, stats in (known_stats or {}).items()}
+
+    total_ads = sum(stats['total'] for stats in category_stats.values())
     new_ads = 0
-    complete_ads = 0
+    complete_ads = sum(stats['complete'] for stats in category_stats.values())
+
+    if not data and not total_ads:
+        return total_ads, new_ads, complete_ads, category_stats
 
-    # Track stats by category
-    category_stats = {}
+    collection = get_listings_collection()
 
-    if not data:
-        return total_ads, new_ads, complete_ads
+    batch_size = get_upload_batch_size()
+    scraped_at = datetime.now().isoformat()
+    operations = []
+    operation_categories = []
+
+    def flush():
+        nonlocal new_ads
+        for index in _upserted_indexes(collection, operations):
+            new_ads += 1
+            category_stats[operation_categories[index]]['new'] += 1
+        operations.clear()
+        operation_categories.clear()
 
     all_listings = [item for page in data.values() for item in page]
     for item in all_listings:
@@ -48,34 +79,56 @@ def upload_data_to_mongo(site_name, data):
             category_stats[category] = {'total': 0, 'new': 0, 'complete': 0}
         category_stats[category]['total'] += 1
 
-        if (item.get('link') and 
-            item.get('main_image') and 
+        if (item.get('link') and
+            item.get('main_image') and
             item.get('title', {}).get('original')):
             complete_ads += 1
             category_stats[category]['complete'] += 1
 
-        try:
-            if not collection.find_one({"link": item["link"], "source": site_name}):
-                item["source"] = site_name
-                item["scraped_at"] = datetime.now().isoformat()
-                collection.insert_one(item)
-                new_ads += 1
-                category_stats[category]['new'] += 1
-        except Exception as e:
-            print(f"Error inserting document: {e}")
-
-    # Store stats for this run
-    _last_run_stats['completeness'][site_name] = f"{(complete_ads / total_ads * 100):.1f}% complete ads ({complete_ads}/{total_ads})"
+        # Listings without a link would all be upserted onto one {link: None} document
+        if not item.get('link'):
+            print("Error inserting document: listing has no link")
+            continue
+
+        # link and source come from the filter, so only the rest is set on insert
+        document = {key: value for key, value in item.items() if key not in ('link', 'source', '_id')}
+        document['scraped_at'] = scraped_at
+        operations.append(UpdateOne(
+            {"link": item["link"], "source": site_name},
+            {"$setOnInsert": document},
+            upsert=True
+        ))
+        operation_categories.append(category)
+
+        if len(operations) >= batch_size:
+            flush()
+
+    if operations:
+        flush()
+
+    # Add to this run's stats (sites upload once per scraped page)
+    site_counts = _run_counts.setdefault(site_name, {})
     for category, stats in category_stats.items():
-        site_category = f"{site_name} - {category}"
-        new_percentage = (stats['new'] / stats['total'] * 100) if stats['total'] > 0 else 0
-        _last_run_stats['new_ads'][site_category] = f"{new_percentage:.1f}% new ads ({stats['new']}/{stats['total']})"
+        counts = site_counts.setdefault(category, {'total': 0, 'new': 0, 'complete': 0})
+        for key in counts:
+            counts[key] += stats[key]
 
-    client.close()
     return total_ads, new_ads, complete_ads, category_stats
 
-def get_last_run_stats():
-    """Get stats from the last run"""
-    return _last_run_stats['completeness'], _last_run_stats['new_ads']
+def get_last_run_stats(site_name=None):
+    """Get stats from the last run (of one site, or of every site)"""
+    completeness = {}
+    new_ads = {}
+    run_counts = _run_counts if site_name is None else {site_name: _run_counts.get(site_name, {})}
+    for site_name, site_counts in list(run_counts.items()):
+        total_ads = sum(stats['total'] for stats in site_counts.values())
+        complete_ads = sum(stats['complete'] for stats in site_counts.values())
+        if total_ads:
+            completeness[site_name] = f"{(complete_ads / total_ads * 100):.1f}% complete ads ({complete_ads}/{total_ads})"
+        for category, stats in site_counts.items():
+            site_category = f"{site_name} - {category}"
+            new_percentage = (stats['new'] / stats['total'] * 100) if stats['total'] > 0 else 0
+            new_ads[site_category] = f"{new_percentage:.1f}% new ads ({stats['new']}/{stats['total']})"
+    return completeness, new_ads
 
 # This script is now a module and doesn't need a main function
\ No newline at end of file
@@ -0,0 +1,113 @@
+from datetime import datetime
+from .driver_service import kill_driver
+import queue
+import threading
+import time
+
+# Seconds to wait for a stopped scraper's thread to finish after its browser is killed
+WATCHDOG_JOIN_TIMEOUT = 10
+
+# Timeouts of the current run, one event per stuck scraper
+_timeout_events = []
+_events_lock = threading.Lock()
+
+def record_timeout(site_name, kind, limit, pages, action, mode):
+    """Record a scraper that ran past a deadline ('page_timeout' or 'site_timeout')"""
+    event = {
+        'site': site_name,
+        'kind': kind,
+        'limit_seconds': limit,
+        'pages_salvaged': pages,
+        'action': action,
+        'mode': mode,
+        'at': datetime.now().isoformat()
+    }
+    with _events_lock:
+        _timeout_events.append(event)
+    print(f"Timeout: {site_name} scraper passed its {kind.replace('_', ' ')} of {limit}s, {action} "
+          f"({pages} pages kept)")
+    return event
+
+def reset_watchdog_events(site_name=None):
+    """Reset the timeout events for a new scraper run (of one site, or of every site)"""
+    with _events_lock:
+        _timeout_events[:] = [event for event in _timeout_events
+                              if site_name is not None and event['site'] != site_name]
+
+def get_watchdog_events():
+    """Get the timeout events of the current run"""
+    with _events_lock:
+        return [dict(event) for event in _timeout_events]
+
+def watch_pages(site_name, pages, page_timeout, site_timeout, stop=None, mode='sequential'):
+    """Iterate a scraper's (page, listings) in a thread of its own, giving up on it past a deadline
+
+    page_timeout is the longest wait for the next page, site_timeout the longest the whole site may take.
+    On a timeout the scraper is told to stop after its current page, stop() (if given) and killing the
+    site's browser unblock it, and once its thread is done (or WATCHDOG_JOIN_TIMEOUT seconds have
+    passed) iteration ends with the pages it sent until then.
+    Errors raised by the scraper are raised here once its earlier pages have been handed on.
+    """
+    results = queue.Queue()
+    cancelled = threading.Event()
+
+    def produce():
+        try:
+            for item in pages:
+                results.put(('page', item))
+                if cancelled.is_set():
+                    break
+            results.put(('done', None))
+        except BaseException as e:
+            results.put(('error', e))
+        finally:
+            # Runs the scraper's cleanup (parse pipeline, crawl depths) in this thread
+            if hasattr(pages, 'close'):
+                pages.close()
+
+    thread = threading.Thread(target=produce, name=f'{site_name}-scraper', daemon=True)
+    start_time = time.time()
+    last_page = start_time
+    count = 0
+    thread.start()
+    while True:
+        now = time.time()
+        page_left = last_page + page_timeout - now
+        site_left = start_time + site_timeout - now
+        try:
+            kind, value = results.get(timeout=max(0.0, min(page_left, site_left)))
+        except queue.Empty:
+            cancelled.set()
+            if stop:
+                stop()
+            kill_driver(site_name)
+            # The scraper fails on its dead browser, its thread hands on no more pages
+            thread.join(WATCHDOG_JOIN_TIMEOUT)
+            action = 'browser killed'
+            if thread.is_alive():
+                print(f"Warning: {site_name} scraper thread still running {WATCHDOG_JOIN_TIMEOUT}s "
+                      f"after its browser was killed")
+                action = 'browser killed, scraper thread left running'
+            # Pages the scraper sent before it stopped are still handed on, its error on the dead browser isn't
+            while True:
+                try:
+                    kind, value = results.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == 'page':
+                    count += 1
+                    yield value
+            if site_left <= page_left:
+                record_timeout(site_name, 'site_timeout', site_timeout, count, action, mode)
+            else:
+                record_timeout(site_name, 'page_timeout', page_timeout, count, action, mode)
+            return
+        if kind == 'page':
+            count += 1
+            yield value
+            # Time spent handling the page doesn't count against the scraper
+            last_page = time.time()
+        elif kind == 'error':
+            raise value
+        else:
+            return